@@ -1,20 +1,30 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict
 import asyncio
 
+from app.core.config import settings
+from app.core.metrics import collect_timings, render_metrics
 from app.models.schema import (
     ScrapingRequest, 
     QueryRequest, 
+    BatchQueryRequest,
+    BatchQueryResult,
     ScrapingResponse, 
     QueryResponse, 
     DocsListResponse,
     StatusResponse,
-    EmbedRequest
+    EmbedRequest,
+    JobStatus
 )
+from app.services.indexes import IndexConfigError
+from app.services.ingestion import StreamingIngestion
+from app.services.jobs import JobManager
 from app.services.scrapper import DocumentationScraper
 from app.services.rag import DocumentationRAG
-from app.utils.helper import get_existing_docs, get_doc_page_count
+from app.utils.helper import get_existing_docs, get_doc_page_count, format_sse
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -22,13 +32,21 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter()
 
-# Dependency for RAG service
-def get_rag_service():
-    return DocumentationRAG()
+# Dependency for RAG service (shared engine created in the app lifespan)
+def get_rag_service(request: Request) -> DocumentationRAG:
+    return request.app.state.rag
+
+# Dependency for the background job manager
+def get_job_manager(request: Request) -> JobManager:
+    return request.app.state.jobs
 
 # Dependency for Scraper service
 def get_scraper_service():
-    return DocumentationScraper()
+    scraper = DocumentationScraper()
+    try:
+        yield scraper
+    finally:
+        scraper.close()
 
 @router.get("/docs", response_model=DocsListResponse)
 async def list_docs():
@@ -47,7 +65,8 @@ async def list_docs():
 @router.post("/scrape", response_model=ScrapingResponse)
 async def scrape_docs(
     request: ScrapingRequest,
-    scraper: DocumentationScraper = Depends(get_scraper_service)
+    scraper: DocumentationScraper = Depends(get_scraper_service),
+    rag: DocumentationRAG = Depends(get_rag_service)
 ):
     """Scrape documentation from multiple URLs"""
     try:
@@ -64,9 +83,16 @@ async def scrape_docs(
         # processed_urls = await asyncio.gather(*tasks)
         
         processed_urls = []
-        for url in request.urls:
-            scraper.pull_docs(str(url), request.docs_name, request.n_pages)
-            processed_urls.append(str(url))
+        if request.index:
+            # Scrape, embed and index in one streaming pass
+            ingestion = StreamingIngestion(rag, scraper)
+            urls = [str(url) for url in request.urls]
+            await run_in_threadpool(ingestion.run, urls, request.docs_name, request.n_pages)
+            processed_urls.extend(urls)
+        else:
+            for url in request.urls:
+                await run_in_threadpool(scraper.pull_docs, str(url), request.docs_name, request.n_pages)
+                processed_urls.append(str(url))
         
         page_count = get_doc_page_count(request.docs_name)
         
@@ -89,7 +115,9 @@ async def process_docs(
     """Process documentation and embed into vector database"""
     try:
         # Process documents
-        rag.process_documents(request.docs_name)
+        await run_in_threadpool(
+            rag.process_documents, request.docs_name, index_config=request.index_config
+        )
         
         return StatusResponse(
             status="success",
@@ -98,6 +126,9 @@ async def process_docs(
                 "message": f"Successfully processed and embedded documents from {request.docs_name}"
             }
         )
+    except IndexConfigError as e:
+        logger.error(f"Invalid index config for {request.docs_name}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing docs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -110,19 +141,107 @@ async def query_docs(
     """Query documentation using RAG (assumes documents are already processed)"""
     try:
         # Generate response
-        answer, chain_of_thought = rag.query(request.question, request.docs_name)
+        with collect_timings() as timings:
+            answer, chain_of_thought, sources = await rag.aquery(request.question, request.docs_name, request)
         
         return QueryResponse(
             question=request.question,
             answer=answer,
             chain_of_thought=chain_of_thought,
-            docs_name=request.docs_name
+            docs_name=request.docs_name,
+            sources=sources,
+            timings={stage: round(ms, 2) for stage, ms in timings.items()} if request.include_timings else None
         )
     except Exception as e:
         logger.error(f"Error querying docs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/query/stream")
+async def query_docs_stream(
+    request: QueryRequest,
+    rag: DocumentationRAG = Depends(get_rag_service)
+):
+    """Stream a RAG answer as server-sent events (sources, thought, answer, metrics, done)"""
+    async def event_stream():
+        try:
+            async for event, data in rag.astream_query(request.question, request.docs_name, request):
+                yield format_sse(event, data)
+            yield format_sse("done", {"docs_name": request.docs_name})
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/query/batch")
+async def query_docs_batch(
+    request: BatchQueryRequest,
+    rag: DocumentationRAG = Depends(get_rag_service)
+):
+    """Answer many questions, streaming one JSON result per line (NDJSON) as each completes"""
+    if len(request.questions) > settings.MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.MAX_BATCH_QUESTIONS} questions per batch"
+        )
+    
+    async def results():
+        async for result in rag.aquery_batch(request.questions, request.docs_name, request):
+            yield BatchQueryResult(**result).model_dump_json() + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.post("/jobs/scrape", response_model=JobStatus, status_code=202)
+async def submit_scrape_job(
+    request: ScrapingRequest,
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Start scraping in the background and return the job right away"""
+    return jobs.submit_scrape(
+        [str(url) for url in request.urls],
+        request.docs_name,
+        request.n_pages,
+        request.index
+    )
+
+@router.post("/jobs/process", response_model=JobStatus, status_code=202)
+async def submit_process_job(
+    request: EmbedRequest,
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Start embedding a documentation directory in the background"""
+    return jobs.submit_process(request.docs_name, request.index_config)
+
+@router.get("/jobs", response_model=List[JobStatus])
+async def list_jobs(jobs: JobManager = Depends(get_job_manager)):
+    """List known background jobs"""
+    return jobs.list()
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Get status, progress and ETA of a background job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatus)
+async def cancel_job(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Cancel a pending or running background job"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
 @router.get("/health", response_model=StatusResponse)
 async def health_check():
     """Health check endpoint"""
-    return StatusResponse(status="healthy")
\ No newline at end of file
+    return StatusResponse(status="healthy")
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latencies, cache hits, loaded-store memory and embedding throughput in Prometheus format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
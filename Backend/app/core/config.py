@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import List, Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,18 +10,111 @@ class Settings(BaseSettings):
     # Base directories
     BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
     DOCS_DIR: Path = BASE_DIR / "docs"
+    # "files" (one markdown file per page) or "packed" (compressed pages in one SQLite file)
+    PAGE_STORE: str = "files"
+    PAGE_STORE_ZSTD_LEVEL: int = 3
     
     # RAG settings
     # MILVUS_URI: str = "./milvus_webrag.db"
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     
+    # Embedding settings
+    EMBEDDING_MODEL: str = "sentence-transformers/all-mpnet-base-v2"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_WORKERS: int = 0
+    EMBEDDING_CACHE_ENABLED: bool = True
+    
+    # Document loading settings
+    LOADER_WORKERS: int = 4
+    LOADER_BATCH_SIZE: int = 256
+    
+    # Vector store settings
+    MAX_LOADED_STORES: int = 16
+    VECTOR_STORE_MEMORY_BUDGET_MB: int = 2048
+    PRELOAD_COLLECTIONS: List[str] = []
+    # Serve vectors straight from the page cache instead of reading whole indexes into RAM
+    VECTOR_STORE_MMAP: bool = True
+    # Convert stores saved in the old pickle format on first load. Off by default because
+    # it unpickles the store; enable it once for stores you created yourself
+    VECTOR_STORE_MIGRATE_PICKLE: bool = False
+    
+    # Retrieval settings (hybrid vector + BM25 search fused by reciprocal rank)
+    RETRIEVAL_K: int = 3
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20
+    RRF_K: int = 60
+    VECTOR_WEIGHT: float = 1.0
+    LEXICAL_WEIGHT: float = 1.0
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    
+    # Context assembly (token budget, dedup and optional cross-encoder rerank)
+    CONTEXT_TOKEN_BUDGET: int = 2000
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_CANDIDATES: int = 20
+    
+    # ANN index settings (defaults for collections without their own config)
+    INDEX_TYPE: Literal["flat", "hnsw", "ivf_flat", "ivf_pq"] = "flat"
+    INDEX_TRAIN_THRESHOLD: int = 50000
+    IVF_NLIST: int = 0
+    PQ_M: int = 64
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 200
+    DEFAULT_NPROBE: int = 16
+    DEFAULT_EF_SEARCH: int = 64
+    
+    # Answer cache settings
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_PERSIST: bool = False
+    
+    # Concurrency settings
+    RAG_THREAD_POOL_SIZE: int = 8
+    MAX_CONCURRENT_QUERIES: int = 32
+    
+    # Batch queries: questions embedded and searched together, LLM calls in flight at once
+    BATCH_PREPARE_SIZE: int = 256
+    BATCH_LLM_CONCURRENCY: int = 8
+    MAX_BATCH_QUESTIONS: int = 10000
+    
+    # Micro-batching: concurrent single queries arriving within the window are
+    # embedded and searched together, up to QUERY_BATCH_MAX_SIZE at a time
+    QUERY_BATCH_ENABLED: bool = True
+    QUERY_BATCH_WINDOW_MS: float = 2.0
+    QUERY_BATCH_MAX_SIZE: int = 32
+    
     # LLM settings
     GROQ_API_KEY: str = os.environ.get("GROQ_API_KEY", "")
     LLM_MODEL: str = "deepseek-r1-distill-qwen-32b"
     
     # Scraper settings
     FIRECRAWL_API_KEY: str = os.environ.get("FIRECRAWL_API_KEY", "")
+    SCRAPER_BACKEND: str = "firecrawl"  # "firecrawl" or "http"
+    SCRAPE_BATCH_SIZE: int = 25
+    SCRAPE_CONCURRENCY: int = 4
+    SCRAPE_RATE_LIMIT: float = 5.0  # requests per second per host, 0 disables
+    SCRAPE_MAX_RETRIES: int = 3
+    SCRAPE_RETRY_BACKOFF: float = 1.0
+    SCRAPE_TIMEOUT: float = 30.0
+    SCRAPE_MAX_DISCOVERY: int = 500
+    FRONTIER_ENABLED: bool = True
+    
+    # Background job settings
+    JOB_WORKERS: int = 2
+    JOB_URL_PARALLELISM: int = 4
+    # How often a worker checks for cancellations requested through another worker
+    JOB_CANCEL_POLL_SECONDS: float = 1.0
+    
+    # Streaming ingestion settings
+    INGEST_QUEUE_SIZE: int = 100
+    INGEST_BATCH_PAGES: int = 20
+    INGEST_PUBLISH_SECONDS: float = 5.0
     
     # Create docs directory if it doesn't exist
     def setup_directories(self):
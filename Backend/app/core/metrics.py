@@ -0,0 +1,178 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds, from sub-millisecond index lookups up to slow LLM calls and crawls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Per-request stage timings, set by collect_timings()
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge that is either set directly or read from a callback at scrape time"""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def render(self) -> List[str]:
+        value = self._function() if self._function is not None else self._value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_format_value(value)}"]
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # {labels: [per-bucket counts (+Inf last), sum]}
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {repr(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Latency of query, process and scrape stages", ["stage"])
+ANSWER_CACHE = Counter("rag_answer_cache_total", "Answer cache lookups by result", ["result"])
+CHUNKS_EMBEDDED = Counter("rag_chunks_embedded_total", "Chunks embedded for indexing")
+EMBEDDING_THROUGHPUT = Gauge("rag_embedding_chunks_per_second", "Throughput of the most recent embedding run")
+PAGES_SCRAPED = Counter("rag_pages_scraped_total", "Pages fetched by the scraper, by outcome", ["outcome"])
+LOADED_STORES = Gauge("rag_vector_stores_loaded", "Vector stores held in memory")
+STORE_MEMORY = Gauge("rag_vector_store_memory_bytes", "Estimated memory of loaded vector stores")
+QUERY_BATCH_SIZE = Histogram(
+    "rag_query_batch_size", "Questions per coalesced embedding and search batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+METRICS = [
+    STAGE_SECONDS, ANSWER_CACHE, CHUNKS_EMBEDDED, EMBEDDING_THROUGHPUT, PAGES_SCRAPED, LOADED_STORES, STORE_MEMORY,
+    QUERY_BATCH_SIZE,
+]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+class span:
+    """Time a stage into the stage histogram and the current request's timings.
+
+    Usable as a context manager (with span("query.embed"): ...).
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def record_stage(stage: str, seconds: float):
+    """Record a stage measured outside a span"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    record_timings({stage: seconds * 1000})
+
+
+def record_timings(timings: Dict[str, float]):
+    """Add stage timings (ms) collected elsewhere, e.g. by a shared batch, to the current request"""
+    current = _timings.get()
+    if current is not None:
+        for stage, ms in timings.items():
+            current[stage] = current.get(stage, 0.0) + ms
+
+
+class collect_timings:
+    """Collect the stage timings (ms) of everything run in this context, e.g. one request"""
+
+    __slots__ = ("timings", "token")
+
+    def __enter__(self) -> Dict[str, float]:
+        self.timings: Dict[str, float] = {}
+        self.token = _timings.set(self.timings)
+        return self.timings
+
+    def __exit__(self, *exc):
+        _timings.reset(self.token)
+        return False
@@ -1,18 +1,39 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import router as api_router
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.services.jobs import JobManager
+from app.services.rag import DocumentationRAG
 
 # Setup logging
-setup_logging()
+logger = setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared RAG engine and job manager once per process"""
+    logger.info("Starting RAG engine")
+    rag = DocumentationRAG()
+    rag.preload(settings.PRELOAD_COLLECTIONS)
+    app.state.rag = rag
+    
+    jobs = JobManager(rag, settings.BASE_DIR / "jobs")
+    jobs.resume()
+    app.state.jobs = jobs
+    yield
+    logger.info("Shutting down RAG engine")
+    jobs.close()
+    rag.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Web Content RAG API",
     description="App for scraping documentation and providing RAG-based Q&A capabilities",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS with more specific settings
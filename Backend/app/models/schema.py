@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Annotated, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel, Field, HttpUrl
 
 # Request models
@@ -6,15 +6,35 @@ class ScrapingRequest(BaseModel):
     urls: List[HttpUrl] = Field(..., description="List of documentation URLs to scrape")
     docs_name: str = Field(..., description="Name of the documentation directory")
     n_pages: Optional[int] = 1
-class QueryRequest(BaseModel):
+    index: bool = Field(False, description="Index pages while scraping so the collection is searchable during the crawl")
+class SearchOptions(BaseModel):
+    k: Optional[int] = Field(None, ge=1, description="Number of chunks to retrieve")
+    nprobe: Optional[int] = Field(None, ge=1, description="IVF cells to probe (recall vs latency)")
+    ef_search: Optional[int] = Field(None, ge=1, description="HNSW search depth (recall vs latency)")
+    vector_weight: Optional[float] = Field(None, ge=0, description="Weight of vector search in rank fusion")
+    lexical_weight: Optional[float] = Field(None, ge=0, description="Weight of BM25 keyword search in rank fusion, 0 disables it")
+class QueryRequest(SearchOptions):
     question: str = Field(..., description="Question to ask about the documentation")
-    docs_name: str = Field(..., description="Name of the documentation directory to query")
+    docs_name: Union[str, Annotated[List[str], Field(min_length=1)]] = Field(
+        ..., description="Documentation directory to query, a list of them, or * for all"
+    )
+    include_timings: bool = Field(False, description="Return per-stage timings with the answer")
+
+class BatchQueryRequest(SearchOptions):
+    questions: List[str] = Field(..., min_length=1, description="Questions to ask about the documentation")
+    docs_name: Union[str, Annotated[List[str], Field(min_length=1)]] = Field(
+        ..., description="Documentation directory to query, a list of them, or * for all"
+    )
 
 # Response models
 class DocPage(BaseModel):
     title: str = Field(..., description="Page title")
     content: str = Field(..., description="Main content of the page")
     url: str = Field(..., description="Page URL")
+    etag: Optional[str] = Field(None, description="ETag response header")
+    last_modified: Optional[str] = Field(None, description="Last-Modified response header")
+    not_modified: bool = Field(False, description="Server confirmed the page is unchanged")
+    links: Optional[List[str]] = Field(None, description="Links on the page, kept for conditional re-discovery")
 
 class ScrapingResponse(BaseModel):
     docs_name: str = Field(..., description="Name of the documentation directory")
@@ -27,18 +47,60 @@ class LastProcessedDoc(BaseModel):
     docs_name: str = Field(..., description="Name of the last processed documentation")
     processed_at: str = Field(..., description="Timestamp when the doc was processed")
 
+class IndexConfig(BaseModel):
+    index_type: Literal["flat", "hnsw", "ivf_flat", "ivf_pq"] = Field("flat", description="Vector index type")
+    train_threshold: int = Field(50000, ge=0, description="Chunk count at which the ANN index replaces the flat index")
+    nlist: int = Field(0, ge=0, description="IVF cell count, 0 picks 4*sqrt(chunks)")
+    pq_m: int = Field(64, ge=1, description="IVF-PQ sub-quantizers; must divide the embedding dimension")
+    hnsw_m: int = Field(32, ge=2, description="HNSW neighbours per node")
+
 class EmbedRequest(BaseModel):
     docs_name: str = Field(..., description="Name of the documentation directory to query")
+    index_config: Optional[IndexConfig] = Field(None, description="Vector index configuration for this collection")
+
+class Source(BaseModel):
+    docs_name: Optional[str] = Field(None, description="Documentation the chunk came from")
+    title: Optional[str] = Field(None, description="Page title")
+    url: Optional[str] = Field(None, description="Page URL")
 
 class QueryResponse(BaseModel):
     question: str = Field(..., description="Original question")
     answer: str = Field(..., description="Answer to the question")
     chain_of_thought: str = Field(..., description="Chain of thought reasoning")
-    docs_name: str = Field(..., description="Documentation used for the answer")
+    docs_name: Union[str, List[str]] = Field(..., description="Documentation used for the answer")
+    sources: List[Source] = Field(default_factory=list, description="Pages the answer was drawn from")
+    timings: Optional[Dict[str, float]] = Field(None, description="Milliseconds spent in each stage, when requested")
+
+class BatchQueryResult(BaseModel):
+    index: int = Field(..., description="Position of the question in the request")
+    question: str = Field(..., description="Original question")
+    answer: Optional[str] = Field(None, description="Answer to the question")
+    chain_of_thought: Optional[str] = Field(None, description="Chain of thought reasoning")
+    sources: List[Source] = Field(default_factory=list, description="Pages the answer was drawn from")
+    cached: bool = Field(False, description="Whether the answer came from the answer cache")
+    error: Optional[str] = Field(None, description="Error message if this question failed")
 
 class DocsListResponse(BaseModel):
     docs: List[dict] = Field(..., description="List of available documentation directories with page counts")
     
+class JobStatus(BaseModel):
+    job_id: str = Field(..., description="Job identifier")
+    kind: str = Field(..., description="Job type: scrape or process")
+    docs_name: str = Field(..., description="Name of the documentation directory")
+    status: str = Field("pending", description="pending, running, completed, failed or cancelled")
+    urls: List[str] = Field(default_factory=list, description="URLs to scrape")
+    urls_done: List[str] = Field(default_factory=list, description="URLs fully scraped")
+    n_pages: Optional[int] = Field(None, description="Page limit per URL")
+    index: bool = Field(False, description="Whether to index the pages after scraping")
+    index_config: Optional[IndexConfig] = Field(None, description="Vector index configuration to apply")
+    pages_done: int = Field(0, description="Pages scraped so far")
+    pages_total: Optional[int] = Field(None, description="Pages discovered so far")
+    eta_seconds: Optional[float] = Field(None, description="Estimated seconds remaining")
+    created_at: float = Field(..., description="Unix time the job was created")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
 class StatusResponse(BaseModel):
     status: str = Field(..., description="Status message")
     details: Optional[dict] = None
\ No newline at end of file
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set
+
+from app.core.metrics import QUERY_BATCH_SIZE, collect_timings, record_stage, record_timings
+
+
+class _Batch:
+    __slots__ = ("items", "futures", "submitted", "timer")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.submitted: List[float] = []
+        self.timer = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls that share a key into one batched call.
+
+    The first call for a key opens a batch that runs window_ms later, or as
+    soon as it holds max_size items. run_batch receives the key and the items
+    and returns one result per item. The stage timings of the batch are
+    credited to every request in it, along with the time each one waited for
+    the batch to start (query.batch_wait).
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+        window_ms: float,
+        max_size: int
+    ):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._pending: Dict[Hashable, _Batch] = {}
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.timer = loop.call_later(self.window, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        batch.submitted.append(time.perf_counter())
+        if len(batch.items) >= self.max_size:
+            batch.timer.cancel()
+            self._flush(key, batch)
+
+        result, waited, timings = await future
+        record_stage("query.batch_wait", waited)
+        record_timings(timings)
+        return result
+
+    def _flush(self, key: Hashable, batch: _Batch):
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        task = asyncio.get_running_loop().create_task(self._run(key, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, key: Hashable, batch: _Batch):
+        # Callers that gave up while waiting are left out
+        live = [i for i, future in enumerate(batch.futures) if not future.done()]
+        if not live:
+            return
+        start = time.perf_counter()
+        QUERY_BATCH_SIZE.observe(len(live))
+        try:
+            with collect_timings() as timings:
+                results = await self.run_batch(key, [batch.items[i] for i in live])
+        except asyncio.CancelledError:
+            for i in live:
+                batch.futures[i].cancel()
+            raise
+        except Exception as e:
+            # Every caller in the batch asked for the same collections, so shares the error
+            for i in live:
+                if not batch.futures[i].done():
+                    batch.futures[i].set_exception(e)
+            return
+        for i, result in zip(live, results):
+            if not batch.futures[i].done():
+                batch.futures[i].set_result((result, start - batch.submitted[i], timings))
@@ -0,0 +1,186 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for exact-match lookups"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+class AnswerCache:
+    """Two-tier answer cache scoped per docs_name.
+
+    The first tier matches normalized question strings, the second matches
+    question embeddings by cosine similarity. Entries expire after a TTL and
+    each collection keeps at most `max_entries`, evicting least recently used.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        similarity_threshold: float,
+        persist_dir: Optional[Path] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.persist_dir = persist_dir
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._collections: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        # Per collection (keys, unit-normalized embedding matrix), rebuilt lazily
+        self._matrices: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+        if self.persist_dir:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, docs_name: str, question: str) -> Optional[Dict[str, Any]]:
+        """Exact lookup on the normalized question"""
+        key = normalize_question(question)
+        with self._lock:
+            entries = self._entries(docs_name)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._remove(docs_name, key)
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get_similar(self, docs_name: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Semantic lookup against recent question embeddings; counts a miss if nothing matches"""
+        with self._lock:
+            keys, matrix = self._matrix(docs_name)
+            if keys:
+                vector = np.asarray(embedding, dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    entry = self._entries(docs_name)[keys[best]]
+                    if not self._expired(entry):
+                        self._entries(docs_name).move_to_end(keys[best])
+                        self.semantic_hits += 1
+                        return entry
+                    self._remove(docs_name, keys[best])
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        docs_name: str,
+        question: str,
+        embedding: List[float],
+        answer: str,
+        chain_of_thought: str,
+        sources: Optional[List[Dict[str, Any]]] = None
+    ):
+        key = normalize_question(question)
+        with self._lock:
+            entries = self._entries(docs_name)
+            entries[key] = {
+                "question": question,
+                "answer": answer,
+                "chain_of_thought": chain_of_thought,
+                "sources": sources or [],
+                "embedding": [float(x) for x in embedding],
+                "created_at": time.time(),
+            }
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._matrices.pop(docs_name, None)
+
+    def invalidate(self, docs_name: str):
+        """Drop every cached answer for a collection whose contents changed"""
+        with self._lock:
+            self._collections[docs_name] = OrderedDict()
+            self._matrices.pop(docs_name, None)
+            if self.persist_dir:
+                self._cache_file(docs_name).unlink(missing_ok=True)
+        logger.info(f"Invalidated answer cache for {docs_name}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "entries": sum(len(entries) for entries in self._collections.values()),
+            }
+
+    def save(self):
+        """Persist all collections to disk when a persist directory is configured"""
+        if not self.persist_dir:
+            return
+        with self._lock:
+            for docs_name, entries in self._collections.items():
+                live = [entry for entry in entries.values() if not self._expired(entry)]
+                with open(self._cache_file(docs_name), "w", encoding="utf-8") as f:
+                    json.dump(live, f)
+        logger.info(f"Saved answer cache for {len(self._collections)} collections")
+
+    def _entries(self, docs_name: str) -> "OrderedDict[str, Dict[str, Any]]":
+        entries = self._collections.get(docs_name)
+        if entries is None:
+            entries = self._load(docs_name)
+            self._collections[docs_name] = entries
+        return entries
+
+    def _load(self, docs_name: str) -> "OrderedDict[str, Dict[str, Any]]":
+        entries = OrderedDict()
+        if not self.persist_dir:
+            return entries
+        cache_file = self._cache_file(docs_name)
+        if cache_file.exists():
+            try:
+                with open(cache_file, encoding="utf-8") as f:
+                    for entry in json.load(f):
+                        if not self._expired(entry):
+                            entries[normalize_question(entry["question"])] = entry
+                logger.info(f"Loaded {len(entries)} cached answers for {docs_name}")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable answer cache for {docs_name}: {str(e)}")
+        return entries
+
+    def _matrix(self, docs_name: str):
+        cached = self._matrices.get(docs_name)
+        if cached is None:
+            entries = self._entries(docs_name)
+            keys = list(entries.keys())
+            if keys:
+                matrix = np.asarray([entries[key]["embedding"] for key in keys], dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix /= np.where(norms == 0, 1.0, norms)
+            else:
+                matrix = None
+            cached = (keys, matrix)
+            self._matrices[docs_name] = cached
+        return cached
+
+    def _remove(self, docs_name: str, key: str):
+        self._entries(docs_name).pop(key, None)
+        self._matrices.pop(docs_name, None)
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _cache_file(self, docs_name: str) -> Path:
+        return self.persist_dir / f"{docs_name}.json"
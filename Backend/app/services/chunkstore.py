@@ -0,0 +1,126 @@
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, Tuple, Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore(Docstore):
+    """Read-only SQLite docstore that loads chunk text and metadata by ID on demand.
+
+    Rows are keyed by their position in the FAISS index, so the same file
+    also serves as the index -> chunk ID mapping (see ChunkIdMap).
+    """
+
+    FILENAME = "chunks.sqlite"
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        # Collections are written once into a fresh directory and swapped in,
+        # so the file never changes underneath a reader
+        self._conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def write(db_path: Path, index_to_docstore_id: Dict[int, str], docstore: InMemoryDocstore):
+        """Write every chunk of an in-memory store, in index order"""
+        conn = sqlite3.connect(str(db_path))
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                """
+                CREATE TABLE chunks (
+                    position INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            rows = (
+                (
+                    position,
+                    chunk_id,
+                    docstore._dict[chunk_id].page_content,
+                    json.dumps(docstore._dict[chunk_id].metadata, default=str)
+                )
+                for position, chunk_id in sorted(index_to_docstore_id.items())
+            )
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, metadata FROM chunks WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def id_at(self, position: int) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM chunks WHERE position = ?", (position,)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def positions(self) -> Iterator[int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT position FROM chunks ORDER BY position").fetchall()
+        return (row[0] for row in rows)
+
+    def rows(self) -> Iterator[Tuple[int, str, Document]]:
+        """Every (position, chunk ID, document) in index order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT position, id, content, metadata FROM chunks ORDER BY position"
+            ).fetchall()
+        for position, chunk_id, content, metadata in rows:
+            yield position, chunk_id, Document(id=chunk_id, page_content=content, metadata=json.loads(metadata))
+
+    def to_memory(self) -> Tuple[InMemoryDocstore, Dict[int, str]]:
+        """Materialize a writable docstore and mapping, e.g. to update the collection"""
+        docs = {}
+        index_to_docstore_id = {}
+        for position, chunk_id, doc in self.rows():
+            docs[chunk_id] = doc
+            index_to_docstore_id[position] = chunk_id
+        return InMemoryDocstore(docs), index_to_docstore_id
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChunkIdMap(Mapping):
+    """Lazy FAISS position -> chunk ID mapping backed by a ChunkStore"""
+
+    def __init__(self, chunks: ChunkStore):
+        self.chunks = chunks
+
+    def __getitem__(self, position: int) -> str:
+        return self.chunks.id_at(position)
+
+    def __iter__(self) -> Iterator[int]:
+        return self.chunks.positions()
+
+    def __len__(self) -> int:
+        return len(self.chunks)
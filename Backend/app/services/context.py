@@ -0,0 +1,165 @@
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - character estimate below
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+_WORD_PATTERN = re.compile(r"\w+")
+
+# The splitter strips the separator between consecutive chunks, so chunks
+# this close together are treated as adjacent
+_ADJACENT_GAP = 16
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens for a text; roughly 4 characters per token without tiktoken"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD_PATTERN.findall(text.lower())
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks with a local cross-encoder, scoring pairs in batches on CPU"""
+
+    def __init__(self, model_name: str, batch_size: int):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def rerank(self, question: str, docs: List[Document]) -> List[Document]:
+        if len(docs) < 2:
+            return docs
+        scores = self._get_model().predict(
+            [(question, doc.page_content) for doc in docs],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order]
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                logger.info(f"Loading reranker model {self.model_name}")
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+
+class ContextBuilder:
+    """Turns ranked chunks into a prompt context that fits a token budget.
+
+    Overlapping or adjacent chunks of the same page are merged back into one
+    passage, near-duplicate passages are dropped, and passages are added in
+    rank order until the budget is spent.
+    """
+
+    def __init__(self, token_budget: int, dedup_threshold: float):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+
+    def build(
+        self,
+        docs: List[Document],
+        url_of: Callable[[Document], Optional[str]] = lambda doc: doc.metadata.get("url")
+    ) -> Tuple[str, List[Document], Dict[str, Any]]:
+        """Return (context, documents used, stats)"""
+        passages = self._dedup(self._merge(docs))
+
+        parts = []
+        used: List[Document] = []
+        tokens = 0
+        for passage, members in passages:
+            url = url_of(members[0])
+            text = f"Source: {url}\n{passage}" if url else passage
+            # Passages are joined by a blank line, about one token
+            cost = count_tokens(text) + (1 if parts else 0)
+            if tokens + cost > self.token_budget:
+                remaining = self.token_budget - tokens - (1 if parts else 0)
+                # Keep a worthwhile prefix of the passage that crosses the budget
+                if remaining >= 100:
+                    parts.append(truncate_tokens(text, remaining))
+                    used.extend(members)
+                break
+            parts.append(text)
+            used.extend(members)
+            tokens += cost
+
+        context = "\n\n".join(parts)
+        stats = {
+            "chunks": len(docs),
+            "passages": len(parts),
+            "raw_tokens": count_tokens("\n\n".join(doc.page_content for doc in docs)),
+            "context_tokens": count_tokens(context),
+        }
+        return context, used, stats
+
+    @staticmethod
+    def _merge(docs: List[Document]) -> List[Tuple[str, List[Document]]]:
+        """Join overlapping or touching chunks of the same page, keeping the best rank of each run"""
+        pages: Dict[Any, List[Tuple[int, Document]]] = {}
+        passages = []
+        for rank, doc in enumerate(docs):
+            start = doc.metadata.get("start_index")
+            if start is None:
+                passages.append((rank, doc.page_content, [doc]))
+                continue
+            key = (doc.metadata.get("docs_name"), doc.metadata.get("source"))
+            pages.setdefault(key, []).append((rank, doc))
+
+        for chunks in pages.values():
+            chunks.sort(key=lambda item: item[1].metadata["start_index"])
+            rank, first = chunks[0]
+            text, end, members = first.page_content, first.metadata["start_index"] + len(first.page_content), [first]
+            for next_rank, doc in chunks[1:]:
+                start = doc.metadata["start_index"]
+                if start <= end + _ADJACENT_GAP:
+                    # Append only the part past the overlap, restoring a stripped separator
+                    text += doc.page_content[end - start:] if start <= end else "\n\n" + doc.page_content
+                    end = max(end, start + len(doc.page_content))
+                    members.append(doc)
+                    rank = min(rank, next_rank)
+                else:
+                    passages.append((rank, text, members))
+                    rank, text, end, members = next_rank, doc.page_content, start + len(doc.page_content), [doc]
+            passages.append((rank, text, members))
+
+        passages.sort(key=lambda item: item[0])
+        return [(text, members) for _, text, members in passages]
+
+    def _dedup(self, passages: List[Tuple[str, List[Document]]]) -> List[Tuple[str, List[Document]]]:
+        """Drop passages contained in, or nearly identical to, a better ranked one"""
+        kept = []
+        kept_shingles = []
+        for text, members in passages:
+            shingles = _shingles(text)
+            duplicate = any(
+                text in other or len(shingles & seen) / len(shingles | seen) >= self.dedup_threshold
+                for (other, _), seen in zip(kept, kept_shingles)
+            )
+            if not duplicate:
+                kept.append((text, members))
+                kept_shingles.append(shingles)
+        return kept
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.metrics import CHUNKS_EMBEDDED, EMBEDDING_THROUGHPUT
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - single-process caches only on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent chunk-text-hash -> vector cache.
+
+    Vectors are appended to a raw float32 file that is read through a memory
+    map, and the matching hashes are appended to a keys file in row order.
+    Several server workers can share a cache: appends hold an exclusive lock
+    on the cache and first read the keys other processes have added, so row
+    numbers always match positions in the vectors file.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = cache_dir / "vectors.f32"
+        self._keys_path = cache_dir / "keys.txt"
+        self._meta_path = cache_dir / "meta.json"
+        self._lock_path = cache_dir / "cache.lock"
+
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        # Lines of the keys file read so far (one per vector row) and their size in bytes
+        self._n_rows = 0
+        self._keys_offset = 0
+        self._mmap = None
+        self._lock = threading.Lock()
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+        if self._rows:
+            logger.info(f"Loaded embedding cache with {len(self._rows)} vectors from {self.cache_dir}")
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for whichever hashes are present"""
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._sync()
+            found = {h: self._rows[h] for h in hashes if h in self._rows}
+            if not found:
+                return {}
+            matrix = self._matrix()
+            return {h: np.array(matrix[row]) for h, row in found.items()}
+
+    def add_many(self, hashes: List[str], vectors: np.ndarray):
+        """Append new vectors; hashes already in the cache are skipped"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock(exclusive=True):
+            # Catch up with rows other processes appended, so ours go after them
+            self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+
+            new_rows = list({h: i for i, h in enumerate(hashes) if h not in self._rows}.values())
+            if not new_rows:
+                return
+
+            # Drop vector rows a crashed writer left without their keys
+            expected = self._n_rows * self.dim * 4
+            if self._vectors_path.exists() and self._vectors_path.stat().st_size > expected:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(expected)
+
+            # Vectors first, then keys: readers only see rows whose keys are written
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{hashes[i]}\n" for i in new_rows)
+            self._sync()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _sync(self):
+        """Read keys appended since the last sync, by this or another process"""
+        if self.dim is None:
+            if not self._meta_path.exists():
+                return
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        if not self._keys_path.exists():
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return
+        for line in data[:end].decode("utf-8").splitlines():
+            # Each line is one vector row, even a hash another process also added
+            self._rows.setdefault(line.strip(), self._n_rows)
+            self._n_rows += 1
+        self._keys_offset += end
+        self._mmap = None
+
+    def _matrix(self) -> np.ndarray:
+        if self._mmap is None:
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(self._n_rows, self.dim)
+            )
+        return self._mmap
+
+
+# Per-process model used by the embedding worker pool
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+
+class EmbeddingPipeline:
+    """Batched chunk embedding with an optional worker process pool and vector cache"""
+
+    def __init__(
+        self,
+        embeddings,
+        model_name: str,
+        batch_size: int,
+        workers: int = 0,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache = cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def embed_texts(
+        self,
+        texts: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """Embed texts in batches, reusing cached vectors for identical text"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(set(hashes)) if self.cache is not None else {}
+
+        # Embed each distinct uncached text once
+        pending: Dict[str, str] = {}
+        for h, text in zip(hashes, texts):
+            if h not in vectors:
+                pending.setdefault(h, text)
+        logger.info(
+            f"Embedding {len(pending)} chunks ({len(texts) - len(pending)} served from cache)"
+        )
+
+        pending_hashes = list(pending.keys())
+        batches = [
+            pending_hashes[i:i + self.batch_size]
+            for i in range(0, len(pending_hashes), self.batch_size)
+        ]
+        batch_texts = [[pending[h] for h in batch] for batch in batches]
+
+        start = time.perf_counter()
+        done = 0
+        for batch_hashes, batch_vectors in zip(batches, self._encode_batches(batch_texts)):
+            batch_vectors = np.asarray(batch_vectors, dtype=np.float32)
+            if self.cache is not None:
+                self.cache.add_many(batch_hashes, batch_vectors)
+            vectors.update(zip(batch_hashes, batch_vectors))
+
+            done += len(batch_hashes)
+            CHUNKS_EMBEDDED.inc(len(batch_hashes))
+            elapsed = time.perf_counter() - start
+            if elapsed:
+                EMBEDDING_THROUGHPUT.set(done / elapsed)
+            logger.info(
+                f"Embedded {done}/{len(pending_hashes)} chunks "
+                f"({done / elapsed if elapsed else 0:.1f} chunks/sec)"
+            )
+            if progress is not None:
+                progress(done, len(pending_hashes))
+
+        return np.stack([vectors[h] for h in hashes]).astype(np.float32, copy=False)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _encode_batches(self, batches: List[List[str]]) -> Iterable:
+        if self.workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield self.embeddings.embed_documents(batch)
+            return
+
+        if self._pool is None:
+            logger.info(f"Starting {self.workers} embedding worker processes")
+            threads = max(1, multiprocessing.cpu_count() // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads)
+            )
+        yield from self._pool.map(_encode_in_worker, batches)
@@ -0,0 +1,384 @@
+import logging
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.models.schema import DocPage
+from app.services.frontier import FetchRecord
+
+logger = logging.getLogger(__name__)
+
+try:
+    from markdownify import markdownify
+except ImportError:  # pragma: no cover - fallback converter below
+    markdownify = None
+
+
+class HostRateLimiter:
+    """Per-host token bucket shared by all scraping threads"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str):
+        """Block until a request to the URL's host is allowed"""
+        if self.rate <= 0:
+            return
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (float(self.burst), now))
+                tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchBackend(ABC):
+    """Interface for page discovery and batch fetching"""
+
+    @abstractmethod
+    def discover_links(
+        self,
+        base_url: str,
+        validators: Optional[Dict[str, FetchRecord]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[str]:
+        """Find the pages under base_url.
+
+        Backends that fetch the pages to find their links may keep those
+        responses as the pages' first fetch in fetch_batch, and may request
+        pages with recorded links conditionally. Once cancel_event is set
+        they stop early and return the links found so far.
+        """
+
+    @abstractmethod
+    def fetch_batch(self, urls: List[str], validators: Optional[Dict[str, FetchRecord]] = None) -> List[DocPage]:
+        """Fetch a chunk of pages; raise if the chunk as a whole failed.
+
+        Backends that support conditional requests use the validators from
+        previous fetches and return unchanged pages with not_modified set.
+        """
+
+    def discard_prefetched(self, urls: List[str]):
+        """Drop responses kept from discovery for pages that will not be fetched"""
+
+    def close(self):
+        pass
+
+
+class FirecrawlBackend(FetchBackend):
+    """Fetches pages through the Firecrawl API"""
+
+    def __init__(self, rate_limiter: HostRateLimiter):
+        from firecrawl import FirecrawlApp
+
+        self.app = FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
+        self.rate_limiter = rate_limiter
+
+    def discover_links(
+        self,
+        base_url: str,
+        validators: Optional[Dict[str, FetchRecord]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[str]:
+        self.rate_limiter.acquire(base_url)
+        initial_crawl = self.app.crawl_url(
+            base_url,
+            params={
+                "scrapeOptions": {"formats": ["links"]},
+            },
+        )
+        all_links = []
+        for item in initial_crawl["data"]:
+            all_links.extend(item["links"])
+        return all_links
+
+    def fetch_batch(self, urls: List[str], validators: Optional[Dict[str, FetchRecord]] = None) -> List[DocPage]:
+        # Firecrawl has no conditional requests; unchanged pages are detected by content hash
+        self.rate_limiter.acquire(urls[0])
+        crawl_results = self.app.batch_scrape_urls(urls)
+
+        doc_pages = []
+        for result in crawl_results["data"]:
+            if result.get("markdown"):
+                doc_pages.append(
+                    DocPage(
+                        title=result.get("metadata", {}).get("title", "Untitled"),
+                        content=result["markdown"],
+                        url=result.get("metadata", {}).get("url", ""),
+                    )
+                )
+            else:
+                logger.warning(
+                    f"Failed to scrape {result.get('metadata', {}).get('url', 'unknown URL')}"
+                )
+        return doc_pages
+
+
+class HttpBackend(FetchBackend):
+    """Fetches pages directly over pooled HTTP connections and converts HTML to markdown"""
+
+    def __init__(self, rate_limiter: HostRateLimiter):
+        self.rate_limiter = rate_limiter
+        self.client = httpx.Client(
+            timeout=settings.SCRAPE_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=settings.SCRAPE_CONCURRENCY * 2,
+                max_keepalive_connections=settings.SCRAPE_CONCURRENCY * 2
+            ),
+            headers={"User-Agent": "Web-Content-QA-Tool/1.0"}
+        )
+        # Responses from link discovery, served as each page's first fetch
+        self._prefetched: Dict[str, httpx.Response] = {}
+        self._prefetched_lock = threading.Lock()
+
+    def discover_links(
+        self,
+        base_url: str,
+        validators: Optional[Dict[str, FetchRecord]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[str]:
+        """Breadth-first crawl of pages under base_url, collecting their links.
+
+        Each level of the crawl is fetched in parallel. Pages with recorded
+        links are requested conditionally; when unchanged their recorded links
+        are followed instead of downloading them again.
+        """
+        validators = validators or {}
+        cancel_event = cancel_event or threading.Event()
+
+        def visit(url: str) -> Tuple[Optional[httpx.Response], List[str]]:
+            if cancel_event.is_set():
+                return None, []
+            record = validators.get(url)
+            if record is not None and record.links is None:
+                record = None
+            try:
+                response = self._get(url, _conditional_headers(record))
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to fetch {url} during link discovery: {str(e)}")
+                return None, []
+            if response.status_code == 304:
+                return response, record.links
+            if "html" not in response.headers.get("content-type", "text/html"):
+                return None, []
+            return response, _extract_links(response.text, str(response.url))
+
+        seen = {base_url}
+        level = [base_url]
+        links = []
+        with ThreadPoolExecutor(max_workers=settings.SCRAPE_CONCURRENCY, thread_name_prefix="discover") as pool:
+            while level and len(links) < settings.SCRAPE_MAX_DISCOVERY and not cancel_event.is_set():
+                level = level[:settings.SCRAPE_MAX_DISCOVERY - len(links)]
+                next_level = []
+                for url, (response, page_links) in zip(level, pool.map(visit, level)):
+                    if response is None:
+                        continue
+                    links.append(url)
+                    with self._prefetched_lock:
+                        self._prefetched[url] = response
+                    for href in page_links:
+                        if href.startswith(base_url) and href not in seen:
+                            seen.add(href)
+                            next_level.append(href)
+                level = next_level
+        return links
+
+    def fetch_batch(self, urls: List[str], validators: Optional[Dict[str, FetchRecord]] = None) -> List[DocPage]:
+        validators = validators or {}
+        doc_pages = []
+        failures = 0
+        for url in urls:
+            record = validators.get(url)
+            with self._prefetched_lock:
+                response = self._prefetched.pop(url, None)
+            # A 304 from discovery only stands if the caller still has the page
+            if response is None or (response.status_code == 304 and record is None):
+                try:
+                    response = self._get(url, _conditional_headers(record))
+                except httpx.HTTPError as e:
+                    logger.warning(f"Failed to scrape {url}: {str(e)}")
+                    failures += 1
+                    continue
+
+            if response.status_code == 304:
+                doc_pages.append(DocPage(title="", content="", url=url, not_modified=True))
+                continue
+            title, content = html_to_markdown(response.text)
+            doc_pages.append(
+                DocPage(
+                    title=title or "Untitled",
+                    content=content,
+                    url=url,
+                    etag=response.headers.get("etag"),
+                    last_modified=response.headers.get("last-modified"),
+                    links=_extract_links(response.text, str(response.url)),
+                )
+            )
+
+        if failures == len(urls):
+            raise RuntimeError(f"All {len(urls)} pages in batch failed")
+        return doc_pages
+
+    def discard_prefetched(self, urls: List[str]):
+        with self._prefetched_lock:
+            for url in urls:
+                self._prefetched.pop(url, None)
+
+    def close(self):
+        with self._prefetched_lock:
+            self._prefetched.clear()
+        self.client.close()
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        self.rate_limiter.acquire(url)
+        response = self.client.get(url, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+
+# One limiter per process (and rate setting), so concurrent scrapes of a host share its budget
+_rate_limiters: Dict[Tuple[float, int], HostRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> HostRateLimiter:
+    """The process-wide per-host rate limiter for the configured rate"""
+    key = (settings.SCRAPE_RATE_LIMIT, settings.SCRAPE_CONCURRENCY)
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = HostRateLimiter(*key)
+        return _rate_limiters[key]
+
+
+def get_fetch_backend(name: Optional[str] = None) -> FetchBackend:
+    """Create the configured fetch backend, sharing the process's per-host rate limiter"""
+    name = name or settings.SCRAPER_BACKEND
+    rate_limiter = shared_rate_limiter()
+    if name == "firecrawl":
+        return FirecrawlBackend(rate_limiter)
+    if name == "http":
+        return HttpBackend(rate_limiter)
+    raise ValueError(f"Unknown scraper backend: {name}")
+
+
+def _conditional_headers(record: Optional[FetchRecord]) -> Dict[str, str]:
+    headers = {}
+    if record is not None:
+        if record.etag:
+            headers["If-None-Match"] = record.etag
+        if record.last_modified:
+            headers["If-Modified-Since"] = record.last_modified
+    return headers
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.hrefs.append(href)
+
+
+def _extract_links(html: str, page_url: str) -> List[str]:
+    parser = _LinkParser()
+    parser.feed(html)
+    links = []
+    for href in parser.hrefs:
+        absolute = urljoin(page_url, href).split("#")[0]
+        if absolute.startswith(("http://", "https://")):
+            links.append(absolute)
+    return links
+
+
+class _MarkdownParser(HTMLParser):
+    """Minimal HTML to markdown conversion used when markdownify is not installed"""
+
+    SKIP = {"script", "style", "nav", "header", "footer", "noscript", "svg"}
+    BLOCKS = {"p", "div", "section", "article", "main", "br", "tr", "table", "ul", "ol"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self.title = ""
+        self._skip = 0
+        self._in_title = False
+        self._in_pre = False
+        self._href: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif re.fullmatch(r"h[1-6]", tag):
+            self.parts.append("\n\n" + "#" * int(tag[1]) + " ")
+        elif tag == "li":
+            self.parts.append("\n- ")
+        elif tag == "pre":
+            self._in_pre = True
+            self.parts.append("\n\n```\n")
+        elif tag == "code" and not self._in_pre:
+            self.parts.append("`")
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+            self.parts.append("[")
+        elif tag in self.BLOCKS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "pre":
+            self._in_pre = False
+            self.parts.append("\n```\n\n")
+        elif tag == "code" and not self._in_pre:
+            self.parts.append("`")
+        elif tag == "a":
+            self.parts.append(f"]({self._href})" if self._href else "]")
+            self._href = None
+        elif re.fullmatch(r"h[1-6]", tag) or tag in self.BLOCKS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip:
+            self.parts.append(data if self._in_pre else re.sub(r"\s+", " ", data))
+
+
+def html_to_markdown(html: str) -> Tuple[str, str]:
+    """Convert an HTML page to (title, markdown)"""
+    parser = _MarkdownParser()
+    parser.feed(html)
+    title = parser.title.strip()
+    if markdownify is not None:
+        content = markdownify(html, heading_style="ATX", strip=["script", "style"])
+    else:
+        content = "".join(parser.parts)
+    content = re.sub(r"\n{3,}", "\n\n", content).strip()
+    return title, content
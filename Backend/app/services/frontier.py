@@ -0,0 +1,114 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FetchRecord(NamedTuple):
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    last_fetched: float
+    links: Optional[List[str]] = None
+
+
+class UrlFrontier:
+    """SQLite store of per-URL fetch metadata used for conditional re-crawls"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS frontier (
+                    docs_name TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    last_fetched REAL NOT NULL,
+                    PRIMARY KEY (docs_name, url)
+                ) WITHOUT ROWID
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(frontier)")}
+            if "links" not in columns:
+                self._conn.execute("ALTER TABLE frontier ADD COLUMN links TEXT")
+
+    def get_many(self, docs_name: str, urls: List[str]) -> Dict[str, FetchRecord]:
+        """Fetch metadata for whichever URLs have been fetched before"""
+        records = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT url, etag, last_modified, content_hash, last_fetched, links FROM frontier "
+                    f"WHERE docs_name = ? AND url IN ({','.join('?' * len(chunk))})",
+                    [docs_name, *chunk]
+                ).fetchall()
+                records.update((row[0], self._record(row)) for row in rows)
+        return records
+
+    def get_all(self, docs_name: str) -> Dict[str, FetchRecord]:
+        """Fetch metadata for every URL recorded for a collection"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, last_fetched, links FROM frontier "
+                "WHERE docs_name = ?",
+                (docs_name,)
+            ).fetchall()
+        return {row[0]: self._record(row) for row in rows}
+
+    def upsert(
+        self,
+        docs_name: str,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        content_hash: str,
+        links: Optional[List[str]] = None
+    ):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO frontier (docs_name, url, etag, last_modified, content_hash, last_fetched, links)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (docs_name, url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    last_fetched = excluded.last_fetched,
+                    links = excluded.links
+                """,
+                (
+                    docs_name, url, etag, last_modified, content_hash, time.time(),
+                    json.dumps(links) if links is not None else None
+                )
+            )
+
+    def touch(self, docs_name: str, url: str):
+        """Record that an unchanged page was checked"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE frontier SET last_fetched = ? WHERE docs_name = ? AND url = ?",
+                (time.time(), docs_name, url)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _record(row) -> FetchRecord:
+        *fields, links = row
+        return FetchRecord(*fields, links=json.loads(links) if links is not None else None)
@@ -0,0 +1,192 @@
+import logging
+import math
+from pathlib import Path
+from typing import List, Optional, Tuple, get_args
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.models.schema import IndexConfig
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = get_args(IndexConfig.model_fields["index_type"].annotation)
+# Bits per PQ code; each sub-quantizer is trained as a 2**PQ_BITS-centroid codebook
+PQ_BITS = 8
+
+
+class IndexConfigError(ValueError):
+    """Raised when an index config cannot be used for a collection"""
+
+
+def default_index_config() -> IndexConfig:
+    return IndexConfig(
+        index_type=settings.INDEX_TYPE,
+        train_threshold=settings.INDEX_TRAIN_THRESHOLD,
+        nlist=settings.IVF_NLIST,
+        pq_m=settings.PQ_M,
+        hnsw_m=settings.HNSW_M,
+    )
+
+
+def check_index_config(config: IndexConfig, dim: int):
+    """Raise IndexConfigError if an index of this config cannot be built for dim-sized vectors"""
+    if config.index_type == "ivf_pq" and dim % config.pq_m:
+        raise IndexConfigError(
+            f"pq_m={config.pq_m} must divide the embedding dimension {dim} for an ivf_pq index"
+        )
+
+
+def index_kind(index) -> str:
+    """Classify a FAISS index as one of INDEX_TYPES"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def target_kind(config: IndexConfig, ntotal: int) -> str:
+    """Index type a collection should use at its current size.
+
+    The index stays flat until there are enough vectors to train the ANN
+    index: train_threshold, at least one per IVF cell and, for IVF-PQ, enough
+    for every PQ codebook.
+    """
+    if config.index_type == "flat" or ntotal < config.train_threshold:
+        return "flat"
+    if config.index_type in ("ivf_flat", "ivf_pq") and ntotal < config.nlist:
+        return "flat"
+    if config.index_type == "ivf_pq" and ntotal < 2 ** PQ_BITS:
+        return "flat"
+    return config.index_type
+
+
+def index_bytes(index) -> int:
+    """Approximate resident size of an index's vectors"""
+    kind = index_kind(index)
+    if kind == "ivf_pq":
+        ivf = faiss.downcast_index(index)
+        return index.ntotal * (ivf.code_size + 8) + ivf.nlist * index.d * 4
+    if kind == "hnsw":
+        hnsw = faiss.downcast_index(index)
+        return index.ntotal * (index.d * 4 + hnsw.hnsw.nb_neighbors(0) * 4)
+    if kind == "ivf_flat":
+        return index.ntotal * (index.d * 4 + 8)
+    return index.ntotal * index.d * 4
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray):
+    """Build and fill an index of the configured type, training it if needed"""
+    n, d = vectors.shape
+    kind = target_kind(config, n)
+    check_index_config(config, d)
+
+    if kind == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, config.hnsw_m)
+        index.hnsw.efConstruction = settings.HNSW_EF_CONSTRUCTION
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = config.nlist or min(n, max(1, int(4 * math.sqrt(n))))
+        quantizer = faiss.IndexFlatL2(d)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, config.pq_m, PQ_BITS)
+        # Train on a sample; FAISS uses at most 256 points per centroid anyway
+        sample_size = min(n, nlist * 256)
+        sample = vectors[np.random.default_rng(0).choice(n, sample_size, replace=False)]
+        logger.info(f"Training {kind} index with nlist={nlist} on {sample_size} vectors")
+        index.train(sample)
+    else:
+        raise IndexConfigError(f"Unknown index type: {kind}")
+
+    index.add(vectors)
+    return index
+
+
+def index_vectors(index, exact: bool = True) -> Optional[np.ndarray]:
+    """Vectors held by an index in position order.
+
+    IVF-PQ only keeps lossy codes, so with exact set it returns None and the
+    caller has to re-embed.
+    """
+    kind = index_kind(index)
+    if kind == "ivf_pq" and exact:
+        return None
+    if kind not in ("ivf_flat", "ivf_pq"):
+        return index.reconstruct_n(0, index.ntotal)
+    # IVF lists are ordered by cell, so looking vectors up by position needs a direct map
+    ivf = faiss.extract_index_ivf(index)
+    ivf.make_direct_map()
+    try:
+        return index.reconstruct_n(0, index.ntotal)
+    finally:
+        ivf.make_direct_map(False)
+
+
+def read_index(path: Path, mmap: bool = False):
+    """Load an index, optionally memory-mapping its vectors read-only"""
+    if not mmap:
+        return faiss.read_index(str(path))
+    # IO_FLAG_MMAP_IFC maps flat storage without copying; older FAISS only has IO_FLAG_MMAP
+    return faiss.read_index(str(path), getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+
+
+def empty_copy(index):
+    """Copy of an index with its training (centroids, codebooks) but no vectors"""
+    empty = faiss.clone_index(index)
+    empty.reset()
+    return empty
+
+
+def search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Per-query search parameters, so concurrent queries never mutate the shared index"""
+    kind = index_kind(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or settings.DEFAULT_NPROBE)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or settings.DEFAULT_EF_SEARCH)
+    return None
+
+
+def search_index(
+    index,
+    vectors: np.ndarray,
+    k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Search an index with a matrix of query vectors, returning (distances, positions).
+
+    Missing results are padded with position -1, as FAISS does.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if index.ntotal == 0:
+        return np.zeros((len(vectors), 0), dtype=np.float32), np.zeros((len(vectors), 0), dtype=np.int64)
+
+    params = search_params(index, nprobe, ef_search)
+    if params is None:
+        return index.search(vectors, k)
+    return index.search(vectors, k, params=params)
+
+
+def documents_at(vector_store, positions) -> List[Document]:
+    """Documents stored at the given index positions, skipping padding and missing IDs"""
+    docs = []
+    for position in positions:
+        if position == -1:
+            continue
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)])
+        if isinstance(doc, Document):
+            docs.append(doc)
+    return docs
+
@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import closing
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+from app.services.pagestore import open_page_store
+from app.services.rag import DocumentationRAG
+from app.services.scrapper import DocumentationScraper
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the page stream
+_DONE = object()
+
+
+class StreamingIngestion:
+    """Scrape -> split -> embed -> index pipeline that streams pages through a bounded queue.
+
+    A producer thread scrapes and saves pages while the calling thread indexes
+    them in small batches. The queue bound applies backpressure to the crawl
+    when embedding falls behind, and the partially built collection is
+    published for queries as it grows.
+    """
+
+    def __init__(self, rag: DocumentationRAG, scraper: DocumentationScraper):
+        self.rag = rag
+        self.scraper = scraper
+
+    def run(
+        self,
+        urls: List[str],
+        docs_dir: str,
+        n_pages: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Ingest every URL into docs_dir and return the number of pages indexed"""
+        cancel_event = cancel_event or threading.Event()
+        pages: "queue.Queue" = queue.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        errors: List[Exception] = []
+        # Set once indexing ends for any reason, so the crawl stops with it
+        stopped = threading.Event()
+
+        def produce():
+            try:
+                for url in urls:
+                    for page in self.scraper.iter_documentation(url, n_pages, docs_dir):
+                        if cancel_event.is_set() or stopped.is_set():
+                            return
+                        filename = self.scraper.save_documentation_page(page, docs_dir)
+                        self._put(pages, filename, stopped)
+            except Exception as e:
+                logger.error(f"Error scraping for streaming ingestion: {str(e)}")
+                errors.append(e)
+            finally:
+                self._put(pages, _DONE, stopped, force=True)
+
+        producer = threading.Thread(target=produce, name=f"ingest-{docs_dir}", daemon=True)
+        producer.start()
+
+        indexed = 0
+        published = committed = False
+        try:
+            with self.rag.process_lock(docs_dir):
+                vector_store, manifest = self.rag.open_for_update(docs_dir)
+                last_publish = time.monotonic()
+                finished = False
+                while not finished and not cancel_event.is_set():
+                    batch, finished = self._next_batch(pages)
+                    if not batch:
+                        continue
+
+                    with closing(open_page_store(docs_dir)) as saved:
+                        hashes = saved.hashes(batch)
+                    changed, _ = manifest.diff(hashes)
+                    changed = [name for name in changed if name in hashes]
+                    if changed:
+                        vector_store = self.rag.apply_changes(docs_dir, vector_store, manifest, changed, [], hashes)
+                    indexed += len(batch)
+                    if progress is not None:
+                        progress(indexed)
+
+                    # Let queries see the partial collection without waiting for the crawl
+                    if vector_store is not None and time.monotonic() - last_publish >= settings.INGEST_PUBLISH_SECONDS:
+                        self.rag.publish(docs_dir, vector_store)
+                        published = True
+                        last_publish = time.monotonic()
+                        logger.info(f"Published partial vector store for {docs_dir} ({indexed} pages)")
+
+                if vector_store is not None:
+                    self.rag.commit(docs_dir, vector_store, manifest)
+                    committed = True
+        finally:
+            stopped.set()
+            producer.join()
+            if published and not committed:
+                # Stop serving a snapshot that was never saved; the next query reloads from disk
+                self.rag.vector_stores.pop(docs_dir)
+                if self.rag.answer_cache is not None:
+                    self.rag.answer_cache.invalidate(docs_dir)
+
+        if errors and not indexed:
+            raise errors[0]
+        logger.info(f"Streaming ingestion indexed {indexed} pages into {docs_dir}")
+        return indexed
+
+    @staticmethod
+    def _put(pages: "queue.Queue", item, cancel_event: threading.Event, force: bool = False):
+        # Block while the indexer is behind, but give up once the run is cancelled
+        while True:
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if cancel_event.is_set() and not force:
+                    return
+                if cancel_event.is_set():
+                    # Make room for the end marker so the indexer can exit
+                    try:
+                        pages.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    @staticmethod
+    def _next_batch(pages: "queue.Queue"):
+        """Wait for one page, then take whatever else is ready up to the batch size"""
+        batch = []
+        item = pages.get()
+        while True:
+            if item is _DONE:
+                return batch, True
+            if item not in batch:
+                batch.append(item)
+            if len(batch) >= settings.INGEST_BATCH_PAGES:
+                return batch, False
+            try:
+                item = pages.get_nowait()
+            except queue.Empty:
+                return batch, False
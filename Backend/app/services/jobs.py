@@ -0,0 +1,294 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.models.schema import IndexConfig, JobStatus
+from app.services.rag import DocumentationRAG, ProcessingCancelled
+from app.services.scrapper import DocumentationScraper
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - single-process deployments only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ("pending", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+
+class JobManager:
+    """Runs scrape and process jobs on a bounded worker pool.
+
+    Job state is persisted as JSON so unfinished jobs are resumed after a
+    restart; scrape jobs skip URLs that were already completed. The pool is
+    separate from the query executor so ingestion cannot starve queries.
+    """
+
+    def __init__(self, rag: DocumentationRAG, jobs_dir: Path):
+        self.rag = rag
+        self.jobs_dir = jobs_dir
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.JOB_WORKERS,
+            thread_name_prefix="job"
+        )
+        self._jobs: Dict[str, JobStatus] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._last_saved: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._resume_lock_file = None
+        self._closing = False
+        # With several server workers a cancel request may reach a worker that
+        # does not run the job; it leaves a marker file the owner polls for
+        self._stopped = threading.Event()
+        self._cancel_watcher = threading.Thread(target=self._watch_cancellations, name="job-cancel", daemon=True)
+        self._cancel_watcher.start()
+
+    def submit_scrape(self, urls: List[str], docs_name: str, n_pages: Optional[int], index: bool) -> JobStatus:
+        job = self._create("scrape", docs_name, urls=urls, n_pages=n_pages, index=index)
+        self.executor.submit(self._run, job.job_id)
+        return job
+
+    def submit_process(self, docs_name: str, index_config: Optional[IndexConfig] = None) -> JobStatus:
+        job = self._create("process", docs_name, index_config=index_config)
+        self.executor.submit(self._run, job.job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return job.model_copy(deep=True)
+        # With several server workers the job may belong to another process;
+        # its persisted state is at most a progress interval behind
+        job_file = self.jobs_dir / f"{job_id}.json"
+        if job_id.isalnum() and job_file.exists():
+            try:
+                return JobStatus.model_validate_json(job_file.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.warning(f"Could not read job file {job_file}: {str(e)}")
+        return None
+
+    def list(self) -> List[JobStatus]:
+        """Jobs of every worker sharing the jobs directory, this worker's from memory"""
+        jobs: Dict[str, JobStatus] = {}
+        for job_file in self.jobs_dir.glob("*.json"):
+            try:
+                job = JobStatus.model_validate_json(job_file.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.warning(f"Could not read job file {job_file}: {str(e)}")
+                continue
+            jobs[job.job_id] = job
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                jobs[job_id] = job.model_copy(deep=True)
+        return sorted(jobs.values(), key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job.status in ACTIVE_STATES:
+                    self._cancel_events[job_id].set()
+                    if job.status == "pending":
+                        self._finish(job, "cancelled")
+                logger.info(f"Cancellation requested for job {job_id}")
+                return job.model_copy(deep=True)
+
+        # Owned by another worker: leave a marker for it to pick up
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in ACTIVE_STATES:
+            self._cancel_file(job_id).touch()
+            logger.info(f"Cancellation requested for job {job_id} owned by another worker")
+        return job
+
+    def resume(self):
+        """Load persisted jobs and resubmit the ones that had not finished.
+
+        When several server workers share the jobs directory only the first to
+        start resumes jobs; it holds a lock on the directory for its lifetime.
+        """
+        if not self._acquire_resume_lock():
+            logger.info("Another worker process owns unfinished jobs, not resuming them here")
+            return
+        resumed = 0
+        for job_file in sorted(self.jobs_dir.glob("*.json")):
+            try:
+                job = JobStatus.model_validate_json(job_file.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable job file {job_file}: {str(e)}")
+                continue
+
+            with self._lock:
+                self._jobs[job.job_id] = job
+                self._cancel_events[job.job_id] = threading.Event()
+            if job.status in ACTIVE_STATES:
+                job.status = "pending"
+                self.executor.submit(self._run, job.job_id)
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished jobs")
+
+    def close(self):
+        self._closing = True
+        self._stopped.set()
+        for event in self._cancel_events.values():
+            event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._resume_lock_file is not None:
+            self._resume_lock_file.close()
+            self._resume_lock_file = None
+
+    def _watch_cancellations(self):
+        while not self._stopped.wait(settings.JOB_CANCEL_POLL_SECONDS):
+            with self._lock:
+                active = [job_id for job_id, job in self._jobs.items() if job.status in ACTIVE_STATES]
+            for job_id in active:
+                if self._cancel_file(job_id).exists():
+                    logger.info(f"Cancellation requested for job {job_id} through another worker")
+                    self._cancel_events[job_id].set()
+
+    def _cancel_file(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.cancel"
+
+    def _acquire_resume_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        lock_file = open(self.jobs_dir / "resume.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._resume_lock_file = lock_file
+        return True
+
+    def _create(self, kind: str, docs_name: str, **fields) -> JobStatus:
+        job = JobStatus(
+            job_id=uuid.uuid4().hex,
+            kind=kind,
+            docs_name=docs_name,
+            created_at=time.time(),
+            **fields
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._cancel_events[job.job_id] = threading.Event()
+            self._save(job)
+        logger.info(f"Created {kind} job {job.job_id} for {docs_name}")
+        return job.model_copy(deep=True)
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status != "pending":
+                return
+            if self._cancel_events[job_id].is_set():
+                self._finish(job, "cancelled")
+                return
+            job.status = "running"
+            job.started_at = job.started_at or time.time()
+            self._save(job)
+        cancel_event = self._cancel_events[job_id]
+
+        try:
+            if job.kind == "scrape":
+                self._run_scrape(job, cancel_event)
+            else:
+                self.rag.process_documents(job.docs_name, index_config=job.index_config, cancel_event=cancel_event)
+            # A cancel that arrived after the last checkpoint did not stop anything
+            with self._lock:
+                self._finish(job, "completed")
+        except (JobCancelled, ProcessingCancelled):
+            if self._closing:
+                # Interrupted by shutdown; the job stays running on disk so it is resumed
+                logger.info(f"Job {job_id} interrupted by shutdown")
+                return
+            with self._lock:
+                self._finish(job, "cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            with self._lock:
+                job.error = str(e)
+                self._finish(job, "failed")
+
+    def _run_scrape(self, job: JobStatus, cancel_event: threading.Event):
+        scraper = DocumentationScraper()
+        remaining = [url for url in job.urls if url not in job.urls_done]
+        changed_files: List[str] = []
+
+        def scrape_url(url: str):
+            links = scraper.get_documentation_links(url, job.docs_name, job.n_pages, cancel_event)
+            if cancel_event.is_set():
+                raise JobCancelled()
+            with self._lock:
+                job.pages_total = (job.pages_total or 0) + len(links)
+
+            for page in scraper.iter_pages(links, job.docs_name):
+                if cancel_event.is_set():
+                    raise JobCancelled()
+                filename = scraper.save_documentation_page(page, job.docs_name)
+                with self._lock:
+                    changed_files.append(filename)
+                    job.pages_done += 1
+                    job.eta_seconds = self._eta(job)
+                    self._save(job, throttle=True)
+
+            with self._lock:
+                job.urls_done.append(url)
+                self._save(job)
+
+        # Scrape URLs in parallel, each one batching its own pages
+        try:
+            with ThreadPoolExecutor(
+                max_workers=settings.JOB_URL_PARALLELISM,
+                thread_name_prefix=f"job-{job.job_id[:8]}"
+            ) as pool:
+                for future in [pool.submit(scrape_url, url) for url in remaining]:
+                    future.result()
+        finally:
+            scraper.close()
+
+        if job.index:
+            if cancel_event.is_set():
+                raise JobCancelled()
+            self.rag.process_documents(job.docs_name, changed_files, cancel_event=cancel_event)
+
+    @staticmethod
+    def _eta(job: JobStatus) -> Optional[float]:
+        if not job.pages_total or not job.pages_done or not job.started_at:
+            return None
+        rate = job.pages_done / (time.time() - job.started_at)
+        return max(job.pages_total - job.pages_done, 0) / rate if rate else None
+
+    def _finish(self, job: JobStatus, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job.eta_seconds = 0.0 if status == "completed" else None
+        self._save(job)
+        self._cancel_file(job.job_id).unlink(missing_ok=True)
+        logger.info(f"Job {job.job_id} {status}")
+
+    def _save(self, job: JobStatus, throttle: bool = False):
+        # Page-level progress is written at most once per second
+        now = time.monotonic()
+        if throttle and now - self._last_saved.get(job.job_id, 0) < 1.0:
+            return
+        self._last_saved[job.job_id] = now
+
+        job_file = self.jobs_dir / f"{job.job_id}.json"
+        tmp_file = job_file.with_suffix(".tmp")
+        tmp_file.write_text(job.model_dump_json(), encoding="utf-8")
+        tmp_file.replace(job_file)
@@ -0,0 +1,175 @@
+import logging
+import math
+import re
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Identifiers keep their dots, dashes, colons and slashes (os.path.join,
+# --max-tokens, E1101, app/main.py) so exact API names match as one term
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+(?:[.\-:/][a-z0-9_]+)*")
+_PART_PATTERN = re.compile(r"[._\-:/]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in into is it its "
+    "me my not of on or so that the their then there these this to was what when "
+    "where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms, plus the parts of compound identifiers (snake_case, dotted, dashed)"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = [part for part in _PART_PATTERN.split(token) if part and part not in STOPWORDS]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    weights: Sequence[float],
+    rrf_k: int,
+    limit: int
+) -> List[int]:
+    """Merge ranked ID lists by weighted reciprocal rank, best first"""
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + weight / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+class LexicalIndex:
+    """BM25 inverted index over a collection's chunks, stored in SQLite.
+
+    Postings are keyed by FAISS index position and packed per term as int32
+    positions followed by uint16 term frequencies, so a query only reads the
+    rows for its own terms.
+    """
+
+    FILENAME = "lexical.sqlite"
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        # Written once next to the index and never modified afterwards
+        self._conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta WHERE key != 'lengths'").fetchall())
+        self.n_docs = int(meta["n_docs"])
+        self.avg_length = float(meta["avg_length"])
+        self._lengths: Optional[np.ndarray] = None
+
+    @staticmethod
+    def build(db_path: Path, texts: Iterable[str]):
+        """Tokenize chunk texts (in index order) and write their postings"""
+        vocabulary: Dict[str, int] = {}
+        term_ids = array("I")
+        positions = array("I")
+        frequencies = array("H")
+        lengths = array("I")
+        for position, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                positions.append(position)
+                frequencies.append(min(count, 65535))
+            lengths.append(len(tokens))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.uint32)
+        positions = np.frombuffer(positions, dtype=np.uint32).astype(np.int32)
+        frequencies = np.frombuffer(frequencies, dtype=np.uint16)
+        lengths = np.frombuffer(lengths, dtype=np.uint32)
+
+        # Group postings by term; the stable sort keeps positions ascending
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, positions, frequencies = term_ids[order], positions[order], frequencies[order]
+        bounds = np.searchsorted(term_ids, np.arange(len(vocabulary) + 1))
+        terms = list(vocabulary)
+
+        conn = sqlite3.connect(str(db_path))
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value)")
+            conn.execute("CREATE TABLE postings (term TEXT PRIMARY KEY, postings BLOB NOT NULL) WITHOUT ROWID")
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("n_docs", len(lengths)),
+                    ("avg_length", float(lengths.mean()) if len(lengths) else 0.0),
+                    ("lengths", lengths.tobytes()),
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO postings VALUES (?, ?)",
+                (
+                    (
+                        terms[term_id],
+                        positions[bounds[term_id]:bounds[term_id + 1]].tobytes()
+                        + frequencies[bounds[term_id]:bounds[term_id + 1]].tobytes()
+                    )
+                    for term_id in range(len(terms))
+                )
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Built lexical index with {len(terms)} terms over {len(lengths)} chunks")
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (index position, BM25 score) pairs for a query"""
+        terms = sorted(set(tokenize(query)))
+        if not terms or not self.n_docs:
+            return []
+
+        with self._lock:
+            if self._lengths is None:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'lengths'").fetchone()
+                self._lengths = np.frombuffer(row[0], dtype=np.uint32).astype(np.float32)
+            rows = self._conn.execute(
+                f"SELECT postings FROM postings WHERE term IN ({','.join('?' * len(terms))})", terms
+            ).fetchall()
+        if not rows:
+            return []
+
+        k1, b = settings.BM25_K1, settings.BM25_B
+        all_positions = []
+        all_scores = []
+        for (blob,) in rows:
+            count = len(blob) // 6
+            positions = np.frombuffer(blob, dtype=np.int32, count=count)
+            frequencies = np.frombuffer(blob, dtype=np.uint16, offset=count * 4).astype(np.float32)
+            idf = math.log(1 + (self.n_docs - count + 0.5) / (count + 0.5))
+            norm = k1 * (1 - b + b * self._lengths[positions] / max(self.avg_length, 1e-9))
+            all_positions.append(positions)
+            all_scores.append(idf * frequencies * (k1 + 1) / (frequencies + norm))
+
+        positions, inverse = np.unique(np.concatenate(all_positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(positions[i]), float(scores[i])) for i in top]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
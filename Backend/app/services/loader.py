@@ -0,0 +1,107 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+def split_front_matter(text: str) -> Tuple[Dict[str, str], str]:
+    """Split the key: value front matter block the scraper writes off the top of a page"""
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---\n", 3)
+    if end == -1:
+        return {}, text
+    meta = {}
+    for line in text[4:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            meta[key.strip()] = value.strip()
+    return meta, text[end + 5:].lstrip("\n")
+
+
+def parse_page(raw: bytes) -> Tuple[Dict[str, str], str]:
+    """Decode a saved page into (front matter, markdown body)"""
+    text = raw.decode("utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+    return split_front_matter(text)
+
+
+def _read_pages(paths: List[str]) -> List[Tuple[str, Dict[str, str], str]]:
+    """Read a batch of pages as (path, front matter, body)"""
+    pages = []
+    for path in paths:
+        # One read per file and a single decode, about twice as fast as text mode
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError as e:
+            logger.warning(f"Could not read {path}: {str(e)}")
+            continue
+        meta, body = parse_page(raw)
+        pages.append((path, meta, body))
+    return pages
+
+
+class MarkdownLoader:
+    """Loads scraped markdown pages, keeping their front matter (title, url) as metadata.
+
+    Files are read whole in batches, on a small thread pool when there is
+    more than one batch so reads overlap, and documents are yielded in order
+    as each batch arrives. Threads rather than processes: the work is mostly
+    I/O, and sending page text back from worker processes costs more than
+    reading it.
+    """
+
+    def __init__(self, workers: int = 0, batch_size: int = 256):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def lazy_load(self, paths: Iterable[Union[str, Path]]) -> Iterator[Document]:
+        paths = [str(path) for path in paths]
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        for pages in self._read_batches(batches):
+            for path, meta, body in pages:
+                yield Document(page_content=body, metadata={"source": path, **meta})
+
+    def load(self, paths: Iterable[Union[str, Path]]) -> List[Document]:
+        return list(self.lazy_load(paths))
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _read_batches(self, batches: Sequence[List[str]]) -> Iterator[List[Tuple[str, Dict[str, str], str]]]:
+        if self.workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield _read_pages(batch)
+            return
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="loader")
+            pool = self._pool
+        # Read at most one batch per worker ahead of the consumer, so a slow
+        # consumer never has the whole collection in memory
+        remaining = iter(batches)
+        pending = deque(pool.submit(_read_pages, batch) for batch in islice(remaining, self.workers))
+        try:
+            while pending:
+                pages = pending.popleft().result()
+                for batch in islice(remaining, 1):
+                    pending.append(pool.submit(_read_pages, batch))
+                yield pages
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """Per-collection record of indexed files, their content hashes and chunk IDs"""
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, files: Optional[Dict[str, Dict]] = None, index_config: Optional[Dict] = None):
+        # {filename: {"hash": str, "ids": [chunk ids]}}
+        self.files: Dict[str, Dict] = files or {}
+        # Vector index configuration chosen for the collection, if any
+        self.index_config: Optional[Dict] = index_config
+
+    @classmethod
+    def load(cls, store_path: Path) -> Optional["IndexManifest"]:
+        """Read the manifest saved alongside a vector store, if any"""
+        manifest_path = store_path / cls.FILENAME
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["files"], data.get("index_config"))
+
+    def save(self, store_path: Path):
+        with open(store_path / self.FILENAME, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "index_config": self.index_config}, f)
+
+    def diff(self, current_hashes: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """Return (new or changed, deleted) filenames compared with current hashes"""
+        changed = [
+            name for name, digest in current_hashes.items()
+            if self.files.get(name, {}).get("hash") != digest
+        ]
+        removed = [name for name in self.files if name not in current_hashes]
+        return changed, removed
+
+    def ids_for(self, names: List[str]) -> List[str]:
+        """Chunk IDs currently indexed for the given files"""
+        return [
+            chunk_id
+            for name in names
+            for chunk_id in self.files.get(name, {}).get("ids", [])
+        ]
+
+    def update(self, name: str, digest: str, ids: List[str]):
+        self.files[name] = {"hash": digest, "ids": ids}
+
+    def remove(self, name: str):
+        self.files.pop(name, None)
@@ -0,0 +1,284 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.services.loader import MarkdownLoader, parse_page
+from app.services.manifest import file_hash
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zlib fallback below
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Stay under SQLite's bound-parameter limit
+_SQL_BATCH = 500
+
+
+def page_filename(url: str) -> str:
+    """Create a safe markdown filename based on a page URL"""
+    url_path = url.split("://")[1] if "://" in url else url
+    safe_filename = re.sub(r'[<>:"/\\|?*]', '-', url_path.split('?')[0])
+    safe_filename = safe_filename.strip("/").replace("/", "-")
+    return f"{safe_filename}.md"
+
+
+def format_page(title: str, url: str, content: str) -> str:
+    """A page as saved on disk: title and URL front matter followed by the markdown"""
+    return f"---\ntitle: {title}\nurl: {url}\n---\n\n{content}"
+
+
+class FilePageStore:
+    """A collection stored as one markdown file per page"""
+
+    def __init__(self, dir_path: Path, loader: Optional[MarkdownLoader] = None):
+        self.dir_path = dir_path
+        self.loader = loader or MarkdownLoader()
+
+    def exists(self) -> bool:
+        return self.dir_path.exists()
+
+    def has(self, name: str) -> bool:
+        return (self.dir_path / name).exists()
+
+    def count(self) -> int:
+        if not self.dir_path.exists():
+            return 0
+        with os.scandir(self.dir_path) as entries:
+            return sum(1 for entry in entries if entry.name.endswith(".md"))
+
+    def names(self) -> List[str]:
+        return sorted(path.name for path in self.dir_path.glob("*.md"))
+
+    def hashes(self, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Content hash of each page, skipping names that are not stored"""
+        names = self.names() if names is None else sorted(set(names))
+        return {name: file_hash(self.dir_path / name) for name in names if (self.dir_path / name).exists()}
+
+    def get(self, name: str) -> Optional[str]:
+        try:
+            return (self.dir_path / name).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def get_by_url(self, url: str) -> Optional[str]:
+        return self.get(page_filename(url))
+
+    def put(self, name: str, text: str):
+        self.put_many([(name, text)])
+
+    def put_many(self, pages: Iterable[Tuple[str, str]]):
+        self.dir_path.mkdir(parents=True, exist_ok=True)
+        for name, text in pages:
+            with open(self.dir_path / name, "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def documents(self, names: Optional[Iterable[str]] = None) -> Iterator[Document]:
+        """Pages as documents with their front matter as metadata"""
+        names = self.names() if names is None else names
+        return self.loader.lazy_load(self.dir_path / name for name in names)
+
+    def close(self):
+        pass
+
+
+class PackedPageStore:
+    """A collection stored as compressed pages in one SQLite file.
+
+    Pages keep their file names (so manifests stay valid) and are compressed
+    with zstd when available, zlib otherwise. The page count is kept by
+    triggers so counting is O(1), URLs are indexed for random access, and
+    scans read rows in insertion order.
+    """
+
+    FILENAME = "pages.sqlite"
+
+    def __init__(self, dir_path: Path):
+        self.dir_path = dir_path
+        self.dir_path.mkdir(parents=True, exist_ok=True)
+        self.db_path = dir_path / self.FILENAME
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE,
+                    url TEXT,
+                    title TEXT,
+                    hash TEXT NOT NULL,
+                    codec TEXT NOT NULL,
+                    data BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS pages_url ON pages (url);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+                INSERT OR IGNORE INTO meta VALUES ('page_count', 0);
+                CREATE TRIGGER IF NOT EXISTS pages_insert AFTER INSERT ON pages BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'page_count';
+                END;
+                CREATE TRIGGER IF NOT EXISTS pages_delete AFTER DELETE ON pages BEGIN
+                    UPDATE meta SET value = value - 1 WHERE key = 'page_count';
+                END;
+                """
+            )
+
+    def exists(self) -> bool:
+        return True
+
+    def has(self, name: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM pages WHERE name = ?", (name,)).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT value FROM meta WHERE key = 'page_count'").fetchone()[0])
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM pages ORDER BY name")]
+
+    def hashes(self, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Content hash of each page, skipping names that are not stored"""
+        with self._lock:
+            if names is None:
+                return dict(self._conn.execute("SELECT name, hash FROM pages ORDER BY name").fetchall())
+            names = sorted(set(names))
+            hashes = {}
+            for start in range(0, len(names), _SQL_BATCH):
+                chunk = names[start:start + _SQL_BATCH]
+                hashes.update(self._conn.execute(
+                    f"SELECT name, hash FROM pages WHERE name IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return {name: hashes[name] for name in names if name in hashes}
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT codec, data FROM pages WHERE name = ?", (name,)).fetchone()
+        return None if row is None else self._decompress(*row).decode("utf-8")
+
+    def get_by_url(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT codec, data FROM pages WHERE url = ?", (url,)).fetchone()
+        return None if row is None else self._decompress(*row).decode("utf-8")
+
+    def put(self, name: str, text: str):
+        self.put_many([(name, text)])
+
+    def put_many(self, pages: Iterable[Tuple[str, str]]):
+        self._put_raw((name, text.encode("utf-8")) for name, text in pages)
+
+    def documents(self, names: Optional[Iterable[str]] = None) -> Iterator[Document]:
+        """Pages as documents with their front matter as metadata.
+
+        The source is the page's path in the collection directory, as if it
+        were stored as a file, so chunks are keyed the same way in both layouts.
+        """
+        for name, codec, data in self._rows(names):
+            meta, body = parse_page(self._decompress(codec, data))
+            yield Document(page_content=body, metadata={"source": str(self.dir_path / name), **meta})
+
+    def migrate_files(self) -> int:
+        """Move loose markdown files in the collection directory into the pack"""
+        with os.scandir(self.dir_path) as entries:
+            paths = sorted(Path(entry.path) for entry in entries if entry.name.endswith(".md") and entry.is_file())
+        if not paths:
+            return 0
+        logger.info(f"Packing {len(paths)} pages in {self.dir_path} into {self.FILENAME}")
+        for start in range(0, len(paths), _SQL_BATCH):
+            batch = paths[start:start + _SQL_BATCH]
+            # Store the exact file bytes so page hashes, and the index manifest, stay valid
+            self._put_raw((path.name, path.read_bytes()) for path in batch)
+            for path in batch:
+                path.unlink()
+        return len(paths)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _put_raw(self, pages: Iterable[Tuple[str, bytes]]):
+        rows = []
+        for name, raw in pages:
+            meta, _ = parse_page(raw)
+            codec, data = self._compress(raw)
+            rows.append((name, meta.get("url"), meta.get("title"), hashlib.sha256(raw).hexdigest(), codec, data))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO pages (name, url, title, hash, codec, data) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    url = excluded.url, title = excluded.title, hash = excluded.hash,
+                    codec = excluded.codec, data = excluded.data
+                """,
+                rows
+            )
+
+    def _rows(self, names: Optional[Iterable[str]]) -> Iterator[Tuple[str, str, bytes]]:
+        if names is None:
+            # Sequential scan in insertion order, fetched in batches
+            last_id = 0
+            while True:
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT id, name, codec, data FROM pages WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, _SQL_BATCH)
+                    ).fetchall()
+                if not rows:
+                    return
+                last_id = rows[-1][0]
+                for _, name, codec, data in rows:
+                    yield name, codec, data
+        names = list(names)
+        for start in range(0, len(names), _SQL_BATCH):
+            chunk = names[start:start + _SQL_BATCH]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT name, codec, data FROM pages WHERE name IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            yield from rows
+
+    @staticmethod
+    def _compress(raw: bytes) -> Tuple[str, bytes]:
+        if zstandard is not None:
+            return "zstd", zstandard.ZstdCompressor(level=settings.PAGE_STORE_ZSTD_LEVEL).compress(raw)
+        return "zlib", zlib.compress(raw, 6)
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("This page store was written with zstd; install zstandard to read it")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == "zlib":
+            return zlib.decompress(data)
+        return data
+
+
+def open_page_store(docs_name: str, loader: Optional[MarkdownLoader] = None, create: bool = False):
+    """Open a collection's pages in the configured layout.
+
+    With PAGE_STORE = "packed", loose markdown files already in the directory
+    are moved into the pack on open. A collection that already has a pack is
+    always read from it. Without create, a missing collection is not created.
+    """
+    dir_path = settings.DOCS_DIR / docs_name
+    if not create and not dir_path.exists():
+        return FilePageStore(dir_path, loader)
+    if settings.PAGE_STORE == "packed" or (dir_path / PackedPageStore.FILENAME).exists():
+        store = PackedPageStore(dir_path)
+        store.migrate_files()
+        return store
+    return FilePageStore(dir_path, loader)
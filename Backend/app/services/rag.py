@@ -1,37 +1,136 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
 import logging
-from typing import Tuple, List,Dict,Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List,Dict,Any, AsyncIterator, Iterator, Optional, Union
 import os
+import shutil
+import threading
+import time
+from contextlib import closing
+from itertools import islice
+from pathlib import Path
 
+import faiss
+import numpy as np
 #from langchain_milvus import Milvus
-from langchain_community.document_loaders import DirectoryLoader
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 # from pymilvus import MilvusClient
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 
 
 
 from app.core.config import settings
+from app.core.metrics import ANSWER_CACHE, LOADED_STORES, STAGE_SECONDS, STORE_MEMORY, span
+from app.models.schema import IndexConfig, SearchOptions
+from app.services.batcher import MicroBatcher
+from app.services.cache import AnswerCache
+from app.services.chunkstore import ChunkIdMap, ChunkStore
+from app.services.context import ContextBuilder, CrossEncoderReranker, count_tokens
+from app.services.embedding import EmbeddingCache, EmbeddingPipeline
+from app.services.indexes import (
+    build_index,
+    check_index_config,
+    default_index_config,
+    documents_at,
+    empty_copy,
+    index_kind,
+    index_vectors,
+    read_index,
+    search_index,
+    target_kind,
+)
+from app.services.lexical import LexicalIndex, reciprocal_rank_fusion
+from app.services.loader import MarkdownLoader
+from app.services.manifest import IndexManifest
+from app.services.pagestore import open_page_store
+from app.services.registry import VectorStoreRegistry
+from app.utils.helper import ProcessLock, ThinkTagSplitter, read_front_matter, sanitize_filename
 
 logger = logging.getLogger(__name__)
 
+# A collection name, a list of them, or "*" for every collection
+DocsSelector = Union[str, List[str]]
+
+# Embedding models by name, loaded once per process. Loading before the
+# server forks its workers (see gunicorn.conf.py) lets them share the weights.
+_embeddings: Dict[str, HuggingFaceEmbeddings] = {}
+_embeddings_lock = threading.Lock()
+
+
+def load_embeddings(model_name: str) -> HuggingFaceEmbeddings:
+    """The process-wide embedding model for a name, loading it on first use"""
+    with _embeddings_lock:
+        if model_name not in _embeddings:
+            logger.info(f"Loading embedding model {model_name}")
+            _embeddings[model_name] = HuggingFaceEmbeddings(model_name=model_name)
+        return _embeddings[model_name]
+
+
+class ProcessingCancelled(Exception):
+    """Raised when indexing a collection is cancelled before it is committed"""
+
+
 class DocumentationRAG:
+    INDEX_FILENAME = "index.faiss"
+
     def __init__(self):
         """Initialize the RAG system components"""
-# Store vector databases for each documentation
-        self.vector_stores: Dict[str, Any] = {}
+        # Bounded LRU registry of loaded vector stores for each documentation
+        self.vector_stores = VectorStoreRegistry(
+            max_stores=settings.MAX_LOADED_STORES,
+            memory_budget_mb=settings.VECTOR_STORE_MEMORY_BUDGET_MB
+        )
+        LOADED_STORES.set_function(lambda: len(self.vector_stores))
+        STORE_MEMORY.set_function(self.vector_stores.memory_usage)
+        self._load_lock = threading.Lock()
+        self._process_locks: Dict[str, ProcessLock] = {}
+        self._process_locks_lock = threading.Lock()
+        
+        # Bounded pool for embedding and FAISS search, plus an async concurrency limiter
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_THREAD_POOL_SIZE,
+            thread_name_prefix="rag"
+        )
+        self.query_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_QUERIES)
+        # Separate pool for fanning a federated search out over collections,
+        # so those tasks never wait behind the requests that submitted them
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_THREAD_POOL_SIZE,
+            thread_name_prefix="rag-search"
+        )
         
         # Create vectorstore directory if it doesn't exist
         os.makedirs(settings.BASE_DIR / "vectorstores", exist_ok=True)
 
         # Initialize embeddings
         logger.info("Initializing embeddings model")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2"
+        self.embeddings = load_embeddings(settings.EMBEDDING_MODEL)
+        
+        # Batched embedding stage for ingestion, backed by a persistent vector cache
+        embedding_cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            embedding_cache = EmbeddingCache(
+                settings.BASE_DIR / "cache" / "embeddings" / sanitize_filename(settings.EMBEDDING_MODEL)
+            )
+        self.embedding_pipeline = EmbeddingPipeline(
+            self.embeddings,
+            model_name=settings.EMBEDDING_MODEL,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            workers=settings.EMBEDDING_WORKERS,
+            cache=embedding_cache
         )
         
+        # Parallel markdown loader that keeps each page's front matter
+        self.loader = MarkdownLoader(workers=settings.LOADER_WORKERS, batch_size=settings.LOADER_BATCH_SIZE)
+        
 
         
         # Initialize LLM
@@ -57,7 +156,8 @@ class DocumentationRAG:
             """
             You are an expert documentation assistant. Use the following documentation context
             to answer the question. If you don't know the answer, just say that you don't
-            have enough information. Keep the answer concise and clear.
+            have enough information. Keep the answer concise and clear, and cite the
+            source URLs you relied on.
             
             Context: {context}
             Question: {question}
@@ -65,11 +165,39 @@ class DocumentationRAG:
             Answer:"""
         )
         
+        # Context assembly, with optional cross-encoder reranking of retrieved chunks
+        self.context_builder = ContextBuilder(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+        )
+        self.reranker = None
+        if settings.RERANK_ENABLED:
+            self.reranker = CrossEncoderReranker(settings.RERANK_MODEL, settings.RERANK_BATCH_SIZE)
+        
+        # Coalesces concurrent single queries into one embedding call and one search per collection
+        self.query_batcher = None
+        if settings.QUERY_BATCH_ENABLED:
+            self.query_batcher = MicroBatcher(
+                self._prepare_coalesced,
+                window_ms=settings.QUERY_BATCH_WINDOW_MS,
+                max_size=settings.QUERY_BATCH_MAX_SIZE
+            )
+        
         # Track processed documents
         self.processed_docs = set()
         
-    def load_docs_from_directory(self, docs_dir: str):
-        """Load all markdown documents from a directory"""
+        # Answer cache so repeated questions skip retrieval and the LLM
+        self.answer_cache = None
+        if settings.ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+                persist_dir=settings.BASE_DIR / "cache" / "answers" if settings.ANSWER_CACHE_PERSIST else None
+            )
+        
+    def load_docs_from_directory(self, docs_dir: str, filenames: Optional[List[str]] = None):
+        """Load markdown documents from a directory, optionally only the given files"""
         dir_path = settings.DOCS_DIR / docs_dir
         logger.info(f"Loading documents from {dir_path}")
         
@@ -80,93 +208,957 @@ class DocumentationRAG:
             
         # Load documents
         try:
-            markdown_docs = DirectoryLoader(str(dir_path), glob="*.md").load()
+            with closing(open_page_store(docs_dir, self.loader)) as pages:
+                markdown_docs = list(pages.documents(filenames))
             logger.info(f"Loaded {len(markdown_docs)} documents from {dir_path}")
             return markdown_docs
         except Exception as e:
             logger.error(f"Error loading documents: {str(e)}")
             return []
 
-    # 
-    def process_documents(self, docs_dir: str):
-        """Process documents and create/update vector store"""
-        # Load documents
-        documents = self.load_docs_from_directory(docs_dir)
+    def process_documents(
+        self,
+        docs_dir: str,
+        filenames: Optional[List[str]] = None,
+        index_config: Optional[IndexConfig] = None,
+        cancel_event: Optional[threading.Event] = None
+    ):
+        """Incrementally index a documentation directory.
         
-        if not documents:
+        Only new or changed files are split and embedded, vectors for changed or
+        deleted files are removed, and the updated store is saved atomically.
+        The whole collection is always compared with the manifest; filenames
+        (e.g. the pages a refresh re-scraped) are only used to report changes
+        found outside them. Passing index_config changes the collection's ANN
+        index type and rebuilds it. Setting cancel_event stops the run between
+        batches with ProcessingCancelled, leaving the saved store untouched.
+        """
+        dir_path = settings.DOCS_DIR / docs_dir
+        if not dir_path.exists():
             logger.warning(f"No documents found in {docs_dir}")
             return
+        
+        with self.process_lock(docs_dir), span("process.total"):
+            # Compare current page hashes with what is already indexed
+            with span("process.hash"), closing(open_page_store(docs_dir, self.loader)) as pages:
+                current_hashes = pages.hashes()
+            vector_store, manifest = self.open_for_update(docs_dir)
+            
+            changed, removed = manifest.diff(current_hashes)
+            if filenames is not None:
+                expected = set(filenames)
+                unexpected = [name for name in changed + removed if name not in expected]
+                if unexpected:
+                    logger.info(f"{len(unexpected)} pages of {docs_dir} changed outside the given files")
+            if index_config is not None:
+                manifest.index_config = index_config.model_dump()
+            if not changed and not removed:
+                if index_config is not None and vector_store is not None:
+                    self.commit(docs_dir, vector_store, manifest, rebuild=True)
+                    return
+                logger.info(f"Vector store for {docs_dir} is up to date")
+                return
+            logger.info(
+                f"Indexing {docs_dir}: {len(changed)} new or changed files, "
+                f"{len(removed)} deleted, {len(current_hashes) - len(changed)} unchanged"
+            )
             
-        # Split documents into chunks
-        logger.info(f"Splitting {len(documents)} documents into chunks")
-        chunks = self.text_splitter.split_documents(documents)
-        logger.info(f"Created {len(chunks)} chunks")
+            vector_store = self.apply_changes(
+                docs_dir, vector_store, manifest, changed, removed, current_hashes, cancel_event
+            )
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled(f"Processing {docs_dir} was cancelled")
+            if vector_store is None:
+                logger.warning(f"No documents found in {docs_dir}")
+                return
+            
+            self.commit(docs_dir, vector_store, manifest, rebuild=index_config is not None)
+            logger.info(f"Successfully processed documents for {docs_dir}")
+
+    def open_for_update(self, docs_dir: str) -> Tuple[Optional[FAISS], IndexManifest]:
+        """Load a private, writable copy of a collection's store and its manifest"""
+        vector_store_path = self._vector_store_path(docs_dir)
+        manifest = IndexManifest.load(vector_store_path) if vector_store_path.exists() else None
+        if manifest is None:
+            if vector_store_path.exists():
+                logger.info(f"No manifest for {docs_dir}, rebuilding vector store")
+            return None, IndexManifest()
+        
+        # Work on a private copy so in-flight queries keep a consistent store
+        return self._load_vector_store_from_disk(docs_dir, writable=True), manifest
+
+    def apply_changes(
+        self,
+        docs_dir: str,
+        vector_store: Optional[FAISS],
+        manifest: IndexManifest,
+        changed: List[str],
+        removed: List[str],
+        hashes: Dict[str, str],
+        cancel_event: Optional[threading.Event] = None
+    ) -> Optional[FAISS]:
+        """Drop stale chunks and embed changed files into the store, updating the manifest.
         
-        # Create vector store path
-        vector_store_path = settings.BASE_DIR / "vectorstores" / docs_dir
+        Raises ProcessingCancelled between batches once cancel_event is set.
+        """
+        self._check_index_config(vector_store, manifest)
         
-        # Create or update vector store
-        if os.path.exists(vector_store_path):
+        # Remove vectors for changed and deleted pages
+        stale_ids = manifest.ids_for(changed + removed)
+        if vector_store is not None and stale_ids:
+            self._delete_chunks(vector_store, stale_ids)
+            logger.info(f"Removed {len(stale_ids)} stale chunks")
+        for name in removed:
+            manifest.remove(name)
+        
+        # Split and embed changed documents a batch of pages at a time, so a large
+        # collection is never loaded whole. The loader carries each page's title
+        # and URL into its chunks for citations. Pages with identical content
+        # still need distinct chunk IDs, so the filename is part of them
+        prefixes = {name: hashlib.sha256(f"{name}\0{hashes[name]}".encode()).hexdigest()[:16] for name in changed}
+        file_chunk_ids: Dict[str, List[str]] = {name: [] for name in changed}
+        n_documents = n_chunks = 0
+        for documents in self.iter_document_batches(docs_dir, changed):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled(f"Processing {docs_dir} was cancelled")
+            with span("process.split"):
+                chunks = self.text_splitter.split_documents(documents)
+            chunk_ids = []
+            for chunk in chunks:
+                name = Path(chunk.metadata["source"]).name
+                chunk_id = f"{prefixes[name]}-{len(file_chunk_ids[name])}"
+                file_chunk_ids[name].append(chunk_id)
+                chunk_ids.append(chunk_id)
+            vector_store = self._add_chunks(docs_dir, vector_store, chunks, chunk_ids)
+            n_documents += len(documents)
+            n_chunks += len(chunks)
+        logger.info(f"Created {n_chunks} chunks from {n_documents} documents")
+        for name in changed:
+            manifest.update(name, hashes[name], file_chunk_ids[name])
+        
+        return vector_store
+
+    def iter_document_batches(self, docs_dir: str, filenames: List[str]) -> Iterator[List[Document]]:
+        """Load the given pages lazily, LOADER_BATCH_SIZE documents at a time"""
+        if not filenames:
+            return
+        with closing(open_page_store(docs_dir, self.loader)) as pages:
+            documents = pages.documents(filenames)
+            while True:
+                with span("process.load"):
+                    batch = list(islice(documents, settings.LOADER_BATCH_SIZE))
+                if not batch:
+                    return
+                yield batch
+
+    def _add_chunks(
+        self,
+        docs_dir: str,
+        vector_store: Optional[FAISS],
+        chunks: List[Document],
+        chunk_ids: List[str]
+    ) -> Optional[FAISS]:
+        """Embed chunks and add them to the store, creating it for the first ones"""
+        if not chunks:
+            return vector_store
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        with span("process.embed"):
+            vectors = self.embedding_pipeline.embed_texts(texts)
+        text_embeddings = list(zip(texts, vectors.tolist()))
+        with span("process.index"):
+            if vector_store is None:
+                logger.info(f"Creating new vector store for {docs_dir}")
+                return FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=chunk_ids)
             logger.info(f"Updating existing vector store for {docs_dir}")
-            # Load existing vector store
-            vector_store = FAISS.load_local(str(vector_store_path), self.embeddings)
-            # Add new documents
-            vector_store.add_documents(chunks)
-        else:
-            logger.info(f"Creating new vector store for {docs_dir}")
-            # Create new vector store
-            vector_store = FAISS.from_documents(chunks, self.embeddings)
-            # Save vector store
-            vector_store.save_local(str(vector_store_path))
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=chunk_ids)
+            return vector_store
+
+    def publish(self, docs_dir: str, vector_store: FAISS):
+        """Make a point-in-time copy of a store being built searchable"""
+        snapshot = FAISS(
+            self.embeddings,
+            faiss.clone_index(vector_store.index),
+            InMemoryDocstore(dict(vector_store.docstore._dict)),
+            dict(vector_store.index_to_docstore_id)
+        )
+        self.vector_stores.put(docs_dir, snapshot)
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(docs_dir)
+
+    def commit(self, docs_dir: str, vector_store: FAISS, manifest: IndexManifest, rebuild: bool = False):
+        """Save a store atomically and swap it in for queries"""
+        with span("process.index"):
+            self._ensure_index_type(docs_dir, vector_store, manifest, force=rebuild)
+        with span("process.save"):
+            self._save_vector_store(vector_store, manifest, self._vector_store_path(docs_dir))
+        
+        # Serve the memory-mapped copy and drop answers computed against the old contents
+        self.vector_stores.put(docs_dir, self._load_vector_store_from_disk(docs_dir))
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(docs_dir)
+
+    def _index_config(self, manifest: IndexManifest) -> IndexConfig:
+        return IndexConfig(**manifest.index_config) if manifest.index_config else default_index_config()
+
+    def _check_index_config(self, vector_store: Optional[FAISS], manifest: IndexManifest):
+        """Reject an index config the collection's vectors cannot use, before anything is embedded"""
+        config = self._index_config(manifest)
+        if config.index_type != "ivf_pq":
+            return
+        dim = vector_store.index.d if vector_store is not None else len(self.embeddings.embed_query("dimension"))
+        check_index_config(config, dim)
+
+    def _ensure_index_type(self, docs_dir: str, vector_store: FAISS, manifest: IndexManifest, force: bool = False):
+        """Switch the store's index to the collection's configured type once it is large enough"""
+        config = self._index_config(manifest)
+        current = index_kind(vector_store.index)
+        desired = target_kind(config, vector_store.index.ntotal)
+        if current == desired and not force:
+            return
+        
+        logger.info(f"Rebuilding {docs_dir} index as {desired} (was {current}, {vector_store.index.ntotal} chunks)")
+        vector_store.index = build_index(config, self._store_vectors(vector_store))
+
+    def _delete_chunks(self, vector_store: FAISS, ids: List[str]):
+        """Remove chunks from a store, whatever its index type"""
+        if index_kind(vector_store.index) == "flat":
+            vector_store.delete(ids)
+            return
+        
+        # IVF ids would no longer line up with the docstore mapping and HNSW
+        # cannot remove at all, so re-add the surviving vectors to an empty
+        # copy of the trained index. Decoded PQ vectors re-encode to the same
+        # codes in the same trained index, so they need not be exact
+        stale = set(ids)
+        ordered = [chunk_id for _, chunk_id in sorted(vector_store.index_to_docstore_id.items())]
+        keep = [position for position, chunk_id in enumerate(ordered) if chunk_id not in stale]
+        vectors = self._store_vectors(vector_store, exact=False)[keep]
+        vector_store.docstore.delete([chunk_id for chunk_id in ids if chunk_id in vector_store.docstore._dict])
+        vector_store.index_to_docstore_id = {i: ordered[position] for i, position in enumerate(keep)}
+        index = empty_copy(vector_store.index)
+        if keep:
+            index.add(vectors)
+        vector_store.index = index
+
+    def _store_vectors(self, vector_store: FAISS, exact: bool = True) -> np.ndarray:
+        """Vectors for a store's chunks in index order, read back from the index where it keeps them"""
+        vectors = index_vectors(vector_store.index, exact)
+        if vectors is None:
+            # Only lossy PQ codes are stored; re-embed (served from the embedding cache when enabled)
+            texts = [
+                vector_store.docstore._dict[vector_store.index_to_docstore_id[i]].page_content
+                for i in range(len(vector_store.index_to_docstore_id))
+            ]
+            vectors = self.embedding_pipeline.embed_texts(texts)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def process_lock(self, docs_dir: str) -> ProcessLock:
+        """Serialize indexing runs per collection, across threads and worker processes"""
+        with self._process_locks_lock:
+            if docs_dir not in self._process_locks:
+                self._process_locks[docs_dir] = ProcessLock(settings.BASE_DIR / "vectorstores" / f"{docs_dir}.lock")
+            return self._process_locks[docs_dir]
+
+    @staticmethod
+    def _vector_store_path(docs_dir: str) -> Path:
+        return settings.BASE_DIR / "vectorstores" / docs_dir
+
+    def _load_vector_store_from_disk(self, docs_dir: str, writable: bool = False) -> FAISS:
+        """Open a saved store.
+        
+        Served stores memory-map the index and read chunks lazily from SQLite;
+        writable ones are fully loaded so they can be updated.
+        """
+        vector_store_path = self._vector_store_path(docs_dir)
+        backup_path = vector_store_path.with_name(f"{vector_store_path.name}.old")
+        if not vector_store_path.exists() and backup_path.exists():
+            # Either a save is swapping directories right now or one was interrupted
+            # and left only the previous version; the lock tells them apart
+            with self.process_lock(docs_dir):
+                if not vector_store_path.exists() and backup_path.exists():
+                    backup_path.rename(vector_store_path)
+        if not (vector_store_path / ChunkStore.FILENAME).exists():
+            self._migrate_legacy_store(docs_dir)
+        
+        index_path = vector_store_path / self.INDEX_FILENAME
+        chunks = ChunkStore(vector_store_path / ChunkStore.FILENAME)
+        if writable:
+            docstore, index_to_docstore_id = chunks.to_memory()
+            chunks.close()
+            return FAISS(self.embeddings, read_index(index_path), docstore, index_to_docstore_id)
+        
+        with span("store.load"):
+            index = read_index(index_path, mmap=settings.VECTOR_STORE_MMAP)
+            vector_store = FAISS(self.embeddings, index, chunks, ChunkIdMap(chunks))
+            # Only saved stores carry a lexical index; published snapshots and
+            # writable copies fall back to vector search
+            vector_store.lexical_index = self._open_lexical_index(docs_dir, chunks)
+            vector_store.disk_version = self._disk_version(docs_dir)
+        return vector_store
+
+    def _disk_version(self, docs_dir: str) -> Optional[Tuple[int, int]]:
+        """Identity of the saved store directory, which every save replaces"""
+        try:
+            stat = self._vector_store_path(docs_dir).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _is_stale(self, docs_dir: str, vector_store: FAISS) -> bool:
+        """Whether another worker process has saved a newer version of a loaded store"""
+        loaded = getattr(vector_store, "disk_version", None)
+        if loaded is None:
+            return False
+        current = self._disk_version(docs_dir)
+        # A missing directory is a save in progress; keep serving until it lands
+        return current is not None and current != loaded
+
+    def _open_lexical_index(self, docs_dir: str, chunks: ChunkStore) -> LexicalIndex:
+        """Open a saved store's BM25 index, building it for stores saved without one"""
+        lexical_path = self._vector_store_path(docs_dir) / LexicalIndex.FILENAME
+        if not lexical_path.exists():
+            # Workers preloading the same collection must not build it over each other
+            with self.process_lock(docs_dir):
+                if not lexical_path.exists():
+                    logger.info(f"Building missing lexical index for {docs_dir}")
+                    tmp_path = lexical_path.with_name(f"{lexical_path.name}.tmp")
+                    tmp_path.unlink(missing_ok=True)
+                    LexicalIndex.build(tmp_path, (doc.page_content for _, _, doc in chunks.rows()))
+                    tmp_path.rename(lexical_path)
+        return LexicalIndex(lexical_path)
+
+    def _migrate_legacy_store(self, docs_dir: str):
+        """Rewrite a store saved by FAISS.save_local (pickled docstore) in the current format"""
+        vector_store_path = self._vector_store_path(docs_dir)
+        with self.process_lock(docs_dir):
+            if (vector_store_path / ChunkStore.FILENAME).exists():
+                return
+            if not (vector_store_path / "index.pkl").exists():
+                raise ValueError(f"Vector store for {docs_dir} is incomplete. Please process documents again.")
+            if not settings.VECTOR_STORE_MIGRATE_PICKLE:
+                raise ValueError(
+                    f"Vector store for {docs_dir} uses the legacy pickle format. Process documents "
+                    "again, or if you trust the store set VECTOR_STORE_MIGRATE_PICKLE=true once to convert it."
+                )
+            
+            logger.warning(f"Migrating legacy pickle vector store for {docs_dir}")
+            legacy = FAISS.load_local(str(vector_store_path),
+                                      self.embeddings,
+                                      allow_dangerous_deserialization=True)
+            self._save_vector_store(legacy, IndexManifest.load(vector_store_path), vector_store_path)
+
+    @classmethod
+    def _save_vector_store(cls, vector_store: FAISS, manifest: Optional[IndexManifest], vector_store_path: Path):
+        """Write the index, chunks and manifest to a temp directory, then swap it into place"""
+        tmp_path = vector_store_path.with_name(f"{vector_store_path.name}.tmp")
+        backup_path = vector_store_path.with_name(f"{vector_store_path.name}.old")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
         
-        # Store in memory
-        self.vector_stores[docs_dir] = vector_store
+        faiss.write_index(vector_store.index, str(tmp_path / cls.INDEX_FILENAME))
+        ChunkStore.write(tmp_path / ChunkStore.FILENAME, vector_store.index_to_docstore_id, vector_store.docstore)
+        LexicalIndex.build(
+            tmp_path / LexicalIndex.FILENAME,
+            (
+                vector_store.docstore._dict[vector_store.index_to_docstore_id[i]].page_content
+                for i in range(len(vector_store.index_to_docstore_id))
+            )
+        )
+        if manifest is not None:
+            manifest.save(tmp_path)
         
-        logger.info(f"Successfully processed documents for {docs_dir}")
+        shutil.rmtree(backup_path, ignore_errors=True)
+        if vector_store_path.exists():
+            vector_store_path.rename(backup_path)
+        tmp_path.rename(vector_store_path)
+        shutil.rmtree(backup_path, ignore_errors=True)
 
     
     def get_vector_store(self, docs_dir: str):
         """Get or load vector store for a documentation directory"""
         # Check if vector store exists in memory
-        if docs_dir in self.vector_stores:
-            return self.vector_stores[docs_dir]
+        vector_store = self.vector_stores.get(docs_dir)
+        if vector_store is not None and not self._is_stale(docs_dir, vector_store):
+            return vector_store
         
         # Check if vector store exists on disk
-        vector_store_path = settings.BASE_DIR / "vectorstores" / docs_dir
-        if os.path.exists(vector_store_path):
-            logger.info(f"Loading vector store from disk for {docs_dir}")
-            vector_store = FAISS.load_local(str(vector_store_path), 
-                                            self.embeddings,
-                                            allow_dangerous_deserialization=True)
-            self.vector_stores[docs_dir] = vector_store
-            return vector_store
+        vector_store_path = self._vector_store_path(docs_dir)
+        backup_path = vector_store_path.with_name(f"{vector_store_path.name}.old")
+        if vector_store_path.exists() or backup_path.exists():
+            with self._load_lock:
+                # Another request may have loaded it while we waited
+                vector_store = self.vector_stores.get(docs_dir)
+                if vector_store is not None:
+                    if not self._is_stale(docs_dir, vector_store):
+                        return vector_store
+                    # Answers cached against the old contents are stale too
+                    logger.info(f"Vector store for {docs_dir} was updated by another worker, reloading")
+                    if self.answer_cache is not None:
+                        self.answer_cache.invalidate(docs_dir)
+                
+                logger.info(f"Loading vector store from disk for {docs_dir}")
+                vector_store = self._load_vector_store_from_disk(docs_dir)
+                self.vector_stores.put(docs_dir, vector_store)
+                return vector_store
         
         # If not found, raise error
         logger.error(f"Vector store not found for {docs_dir}. Please process documents first.")
         raise ValueError(f"Vector store not found for {docs_dir}. Please process documents first.")
 
-    def query(self, question: str, docs_dir: str) -> Tuple[str, str]:
-        """Query the documentation"""
+    def preload(self, docs_dirs: List[str]):
+        """Load configured vector stores into memory ahead of the first query"""
+        for docs_dir in docs_dirs:
+            try:
+                self.get_vector_store(docs_dir)
+            except Exception as e:
+                logger.warning(f"Could not preload vector store for {docs_dir}: {str(e)}")
+        
+        logger.info(
+            f"Preloaded {len(self.vector_stores)} vector stores "
+            f"({self.vector_stores.memory_usage() / 1024 / 1024:.1f} MB)"
+        )
+
+    def list_collections(self) -> List[str]:
+        """Names of every collection with a saved or published vector store"""
+        names = set(self.vector_stores.names())
+        vectorstores_dir = settings.BASE_DIR / "vectorstores"
+        for path in vectorstores_dir.iterdir():
+            if path.is_dir() and not path.name.endswith(".tmp"):
+                names.add(path.name[:-len(".old")] if path.name.endswith(".old") else path.name)
+        return sorted(names)
+
+    def resolve_collections(self, docs_name: DocsSelector) -> List[str]:
+        """Expand a docs_name, list of names or "*" into collection names"""
+        names = [docs_name] if isinstance(docs_name, str) else list(dict.fromkeys(docs_name))
+        if "*" in names:
+            names = self.list_collections()
+            if not names:
+                raise ValueError("No processed documentation found. Please process documents first.")
+        return names
+
+    def retrieve(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        embedding: Optional[List[float]] = None,
+        options: Optional[SearchOptions] = None
+    ) -> List[Document]:
+        """Search one or more collections, embedding the question if needed"""
+        if embedding is None:
+            with span("query.embed"):
+                embedding = self.embeddings.embed_query(question)
+        return self.retrieve_batch([question], docs_dir, [embedding], options)[0]
+
+    def retrieve_batch(
+        self,
+        questions: List[str],
+        docs_dir: DocsSelector,
+        embeddings: List[List[float]],
+        options: Optional[SearchOptions] = None
+    ) -> List[List[Document]]:
+        """Retrieve context for many embedded questions with one index search per collection"""
+        with span("query.load_store"):
+            names = self.resolve_collections(docs_dir)
+            if len(names) == 1:
+                stores = {names[0]: self.get_vector_store(names[0])}
+            else:
+                stores = dict(zip(names, self.search_executor.map(self.get_vector_store, names)))
+        
+        if self.reranker is None:
+            with span("query.search"):
+                results = self.search(stores, questions, embeddings, options)
+        else:
+            # Over-fetch, let the cross-encoder reorder, and keep the top k
+            options = options or SearchOptions()
+            k = options.k or settings.RETRIEVAL_K
+            candidates = options.model_copy(update={"k": max(k, settings.RERANK_CANDIDATES)})
+            with span("query.search"):
+                results = self.search(stores, questions, embeddings, candidates)
+            with span("query.rerank"):
+                results = [self.reranker.rerank(question, docs)[:k] for question, docs in zip(questions, results)]
+        logger.info(
+            f"Retrieved {sum(len(docs) for docs in results)} relevant documents for "
+            f"{len(questions)} questions from {len(stores)} collections"
+        )
+        return results
+
+    def search(
+        self,
+        stores: Dict[str, FAISS],
+        questions: List[str],
+        embeddings: List[List[float]],
+        options: Optional[SearchOptions] = None
+    ) -> List[List[Document]]:
+        """Top-k chunks across collections for each question, fusing vector and BM25 rankings.
+        
+        Each store's index is searched once with the whole query matrix.
+        Vector hits from all collections are ranked together by distance (they
+        share one embedding model) and BM25 hits by score, then the two
+        rankings are merged with reciprocal rank fusion. Each returned
+        document's metadata records its docs_name.
+        """
+        options = options or SearchOptions()
+        k = options.k or settings.RETRIEVAL_K
+        vector_weight = settings.VECTOR_WEIGHT if options.vector_weight is None else options.vector_weight
+        lexical_weight = settings.LEXICAL_WEIGHT if options.lexical_weight is None else options.lexical_weight
+        use_lexical = settings.HYBRID_SEARCH_ENABLED and lexical_weight > 0
+        n_candidates = max(k, settings.HYBRID_CANDIDATES) if use_lexical else k
+        query_matrix = np.array(embeddings, dtype=np.float32)
+        
+        def candidates(name: str):
+            return name, self._candidates(
+                stores[name], questions, query_matrix, options, n_candidates, use_lexical, vector_weight
+            )
+        
+        if len(stores) == 1:
+            per_store = [candidates(name) for name in stores]
+        else:
+            per_store = list(self.search_executor.map(candidates, stores))
+        
+        results = []
+        for row in range(len(questions)):
+            vector_hits = sorted(
+                (distance, name, position) for name, hits in per_store for position, distance in hits[row][0]
+            )
+            vector_ranking = [(name, position) for _, name, position in vector_hits]
+            if all(hits[row][1] is None for _, hits in per_store):
+                ranking = vector_ranking[:k]
+            else:
+                lexical_hits = sorted(
+                    (-score, name, position) for name, hits in per_store for position, score in hits[row][1] or []
+                )
+                ranking = reciprocal_rank_fusion(
+                    [vector_ranking, [(name, position) for _, name, position in lexical_hits]],
+                    [vector_weight, lexical_weight],
+                    settings.RRF_K,
+                    k
+                )
+            
+            docs = []
+            for name, position in ranking:
+                for doc in documents_at(stores[name], [position]):
+                    docs.append(doc.model_copy(update={"metadata": {**doc.metadata, "docs_name": name}}))
+            results.append(docs)
+        return results
+
+    @staticmethod
+    def _candidates(
+        vector_store: FAISS,
+        questions: List[str],
+        query_matrix: np.ndarray,
+        options: SearchOptions,
+        n: int,
+        use_lexical: bool,
+        vector_weight: float
+    ) -> List[Tuple[List[Tuple[int, float]], Optional[List[Tuple[int, float]]]]]:
+        """Vector (position, distance) and BM25 (position, score) hits per question for one store.
+        
+        Lexical hits are None when the store has no usable lexical index.
+        """
+        lexical = [None] * len(questions)
+        lexical_index = getattr(vector_store, "lexical_index", None) if use_lexical else None
+        if lexical_index is not None and lexical_index.n_docs != vector_store.index.ntotal:
+            logger.warning("Lexical index is out of sync with the vector index, using vector search only")
+            lexical_index = None
+        if lexical_index is not None:
+            lexical = [lexical_index.search(question, n) for question in questions]
+        
+        vector = [[] for _ in questions]
+        if lexical_index is None or vector_weight > 0:
+            distances, positions = search_index(
+                vector_store.index, query_matrix, n, options.nprobe, options.ef_search
+            )
+            vector = [
+                [(int(p), float(d)) for p, d in zip(row_positions, row_distances) if p != -1]
+                for row_positions, row_distances in zip(positions, distances)
+            ]
+        return list(zip(vector, lexical))
+
+    def prepare(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> Tuple[Optional[Dict[str, Any]], List[Document], List[float]]:
+        """Check the answer cache and, on a miss, retrieve context for the question.
+        
+        Returns (cached_entry, docs, embedding); docs is empty on a cache hit.
+        Federated queries and queries with non-default search options are not cached.
+        """
+        return self.prepare_batch([question], docs_dir, options)[0]
+
+    def prepare_batch(
+        self,
+        questions: List[str],
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> List[Tuple[Optional[Dict[str, Any]], List[Document], List[float]]]:
+        """prepare() for many questions, with one embedding call and one search per collection"""
+        cache_key = self._cache_key(docs_dir, options)
+        use_cache = self.answer_cache is not None and cache_key is not None
+        prepared: List[Optional[Tuple[Optional[Dict[str, Any]], List[Document], List[float]]]] = [None] * len(questions)
+        
+        misses = []
+        with span("query.cache"):
+            for i, question in enumerate(questions):
+                cached = self.answer_cache.get(cache_key, question) if use_cache else None
+                if cached is not None:
+                    logger.info(f"Answer cache hit for {cache_key}: {question}")
+                    ANSWER_CACHE.inc(result="hit")
+                    prepared[i] = (cached, [], cached["embedding"])
+                else:
+                    misses.append(i)
+        if not misses:
+            return prepared
+        
+        with span("query.embed"):
+            if len(misses) == 1:
+                embeddings = [self.embeddings.embed_query(questions[misses[0]])]
+            else:
+                embeddings = self.embeddings.embed_documents([questions[i] for i in misses])
+        to_search = []
+        with span("query.cache"):
+            for i, embedding in zip(misses, embeddings):
+                cached = self.answer_cache.get_similar(cache_key, embedding) if use_cache else None
+                if cached is not None:
+                    logger.info(f"Semantic answer cache hit for {cache_key}: {questions[i]}")
+                    ANSWER_CACHE.inc(result="semantic_hit")
+                    prepared[i] = (cached, [], embedding)
+                else:
+                    if use_cache:
+                        ANSWER_CACHE.inc(result="miss")
+                    to_search.append((i, embedding))
+        
+        if to_search:
+            docs_lists = self.retrieve_batch(
+                [questions[i] for i, _ in to_search], docs_dir, [embedding for _, embedding in to_search], options
+            )
+            for (i, embedding), docs in zip(to_search, docs_lists):
+                prepared[i] = (None, docs, embedding)
+        return prepared
+
+    async def aprepare(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> Tuple[Optional[Dict[str, Any]], List[Document], List[float]]:
+        """prepare() on the worker pool, batched with concurrent questions for the same collections and options"""
+        if self.query_batcher is None:
+            return await self.run_blocking(self.prepare, question, docs_dir, options)
+        if options is not None:
+            # Requests subclass SearchOptions; batch on the search fields alone,
+            # not the question or other request fields
+            options = SearchOptions(**options.model_dump(include=set(SearchOptions.model_fields)))
+        key = (
+            docs_dir if isinstance(docs_dir, str) else tuple(docs_dir),
+            options.model_dump_json() if options is not None else None
+        )
+        return await self.query_batcher.submit(key, (question, docs_dir, options))
+
+    async def _prepare_coalesced(self, key, items: List[Tuple[str, DocsSelector, Optional[SearchOptions]]]):
+        _, docs_dir, options = items[0]
+        return await self.run_blocking(self.prepare_batch, [question for question, _, _ in items], docs_dir, options)
+
+    def query(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> Tuple[str, str, List[Dict[str, Any]]]:
+        """Query the documentation, returning (answer, chain_of_thought, sources)"""
         logger.info(f"Processing query for {docs_dir}: {question}")
         
-        # Get vector store
-        vector_store = self.get_vector_store(docs_dir)
+        with span("query.total"):
+            # Get cached answer or relevant documents
+            cached, docs, embedding = self.prepare(question, docs_dir, options)
+            if cached is not None:
+                return cached["answer"], cached["chain_of_thought"], cached.get("sources", [])
+            
+            # Combine context
+            context, sources = self.build_context(question, docs)
+            
+            # Generate response
+            logger.info("Generating response")
+            chain = self.prompt | self.llm
+            with span("query.llm"):
+                response = chain.invoke({"context": context, "question": question})
+            
+            logger.info("Query processed successfully")
+            return (*self._cache_response(question, docs_dir, options, embedding, response.content, sources), sources)
+
+    async def aquery(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> Tuple[str, str, List[Dict[str, Any]]]:
+        """Query the documentation without blocking the event loop"""
+        async with self.query_semaphore:
+            logger.info(f"Processing async query for {docs_dir}: {question}")
+            
+            with span("query.total"):
+                # Embedding and FAISS search are CPU bound, run them (batched) on the worker pool
+                cached, docs, embedding = await self.aprepare(question, docs_dir, options)
+                if cached is not None:
+                    return cached["answer"], cached["chain_of_thought"], cached.get("sources", [])
+                context, sources = self.build_context(question, docs)
+            
+                # Groq call goes through the async client
+                logger.info("Generating response")
+                chain = self.prompt | self.llm
+                with span("query.llm"):
+                    response = await chain.ainvoke({"context": context, "question": question})
+            
+                logger.info("Query processed successfully")
+                return (*self._cache_response(question, docs_dir, options, embedding, response.content, sources), sources)
+
+    async def astream_query(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Stream a query as (event, data) pairs: sources, thought/answer text, then metrics"""
+        async with self.query_semaphore:
+            logger.info(f"Processing streaming query for {docs_dir}: {question}")
+            start = time.perf_counter()
+            
+            cached, docs, embedding = await self.aprepare(question, docs_dir, options)
+            retrieval_time = time.perf_counter() - start
+            
+            if cached is not None:
+                yield "sources", {"sources": cached.get("sources", [])}
+                yield "thought", {"text": cached["chain_of_thought"]}
+                yield "answer", {"text": cached["answer"]}
+                first_token_time = retrieval_time
+            else:
+                context, sources = self.build_context(question, docs)
+                yield "sources", {"sources": sources}
+                chain = self.prompt | self.llm
+                splitter = ThinkTagSplitter()
+                response_text = ""
+                first_token_time = None
+                llm_start = time.perf_counter()
+                async for chunk in chain.astream({"context": context, "question": question}):
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start
+                    response_text += chunk.content
+                    for event, text in splitter.feed(chunk.content):
+                        yield event, {"text": text}
+                STAGE_SECONDS.observe(time.perf_counter() - llm_start, stage="query.llm")
+                for event, text in splitter.flush():
+                    yield event, {"text": text}
+                self._cache_response(question, docs_dir, options, embedding, response_text, sources)
+            
+            total_time = time.perf_counter() - start
+            STAGE_SECONDS.observe(total_time, stage="query.total")
+            metrics = {
+                "cached": cached is not None,
+                "retrieval_ms": round(retrieval_time * 1000, 1),
+                "ttft_ms": round((first_token_time or total_time) * 1000, 1),
+                "total_ms": round(total_time * 1000, 1),
+            }
+            logger.info(f"Streaming query processed successfully: {metrics}")
+            yield "metrics", metrics
+
+    def query_batch(
+        self,
+        questions: List[str],
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many questions, returning one result dict per question in input order"""
+        logger.info(f"Processing batch of {len(questions)} queries for {docs_dir}")
+        prepared = []
+        for start in range(0, len(questions), settings.BATCH_PREPARE_SIZE):
+            prepared.extend(self.prepare_batch(questions[start:start + settings.BATCH_PREPARE_SIZE], docs_dir, options))
         
-        # Get relevant documents
-        docs = vector_store.similarity_search(question, k=3)
-        logger.info(f"Retrieved {len(docs)} relevant documents")
+        results = [None] * len(questions)
+        pending = []
+        for i, (question, (cached, docs, embedding)) in enumerate(zip(questions, prepared)):
+            if cached is not None:
+                results[i] = self._batch_result(
+                    i, question, cached["answer"], cached["chain_of_thought"], cached.get("sources", []), True
+                )
+            else:
+                context, sources = self.build_context(question, docs)
+                pending.append((i, question, embedding, sources, {"context": context, "question": question}))
         
-        # Combine context
-        context = "\n\n".join([doc.page_content for doc in docs])
+        chain = self.prompt | self.llm
+        with span("query.llm"):
+            responses = chain.batch(
+                [inputs for *_, inputs in pending],
+                config={"max_concurrency": settings.BATCH_LLM_CONCURRENCY},
+                return_exceptions=True
+            )
+        for (i, question, embedding, sources, _), response in zip(pending, responses):
+            if isinstance(response, Exception):
+                results[i] = self._batch_result(i, question, error=str(response))
+            else:
+                answer, chain_of_thought = self._cache_response(question, docs_dir, options, embedding, response.content, sources)
+                results[i] = self._batch_result(i, question, answer, chain_of_thought, sources, False)
+        return results
+
+    async def aquery_batch(
+        self,
+        questions: List[str],
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Answer many questions, yielding result dicts as each one completes.
         
-        # Generate response
-        logger.info("Generating response")
+        Questions are prepared in slices (one embedding call and one index
+        search per slice) while earlier slices are already waiting on the LLM,
+        with at most BATCH_LLM_CONCURRENCY LLM calls in flight.
+        """
+        logger.info(f"Processing async batch of {len(questions)} queries for {docs_dir}")
+        llm_slots = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+        results: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
         chain = self.prompt | self.llm
-        response = chain.invoke({"context": context, "question": question})
+        tasks = []
+        
+        async def answer(i: int, question: str, cached, docs: List[Document], embedding: List[float]):
+            try:
+                if cached is not None:
+                    await results.put(self._batch_result(
+                        i, question, cached["answer"], cached["chain_of_thought"], cached.get("sources", []), True
+                    ))
+                    return
+                context, sources = self.build_context(question, docs)
+                async with llm_slots:
+                    with span("query.llm"):
+                        response = await chain.ainvoke({"context": context, "question": question})
+                answer, chain_of_thought = self._cache_response(question, docs_dir, options, embedding, response.content, sources)
+                await results.put(self._batch_result(i, question, answer, chain_of_thought, sources, False))
+            except Exception as e:
+                logger.error(f"Error answering batch question {i}: {str(e)}")
+                await results.put(self._batch_result(i, question, error=str(e)))
         
-        # Extract chain of thought and response
-        response_text = response.content
+        async def prepare_all():
+            for start in range(0, len(questions), settings.BATCH_PREPARE_SIZE):
+                batch = questions[start:start + settings.BATCH_PREPARE_SIZE]
+                try:
+                    prepared = await self.run_blocking(self.prepare_batch, batch, docs_dir, options)
+                except Exception as e:
+                    logger.error(f"Error retrieving context for batch: {str(e)}")
+                    for offset, question in enumerate(batch):
+                        await results.put(self._batch_result(start + offset, question, error=str(e)))
+                    continue
+                for offset, (question, (cached, docs, embedding)) in enumerate(zip(batch, prepared)):
+                    tasks.append(asyncio.create_task(answer(start + offset, question, cached, docs, embedding)))
         
+        preparer = asyncio.create_task(prepare_all())
+        try:
+            for _ in range(len(questions)):
+                yield await results.get()
+        finally:
+            # Stop outstanding work if the consumer goes away early
+            preparer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _batch_result(
+        index: int,
+        question: str,
+        answer: Optional[str] = None,
+        chain_of_thought: Optional[str] = None,
+        sources: Optional[List[Dict[str, Any]]] = None,
+        cached: bool = False,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return {
+            "index": index,
+            "question": question,
+            "answer": answer,
+            "chain_of_thought": chain_of_thought,
+            "sources": sources or [],
+            "cached": cached,
+            "error": error,
+        }
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking function on the bounded RAG worker pool, in the caller's context"""
+        loop = asyncio.get_running_loop()
+        # Copy the context so stage timings recorded in the worker reach the request
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+
+    def close(self):
+        """Release worker threads and loaded stores"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.search_executor.shutdown(wait=False, cancel_futures=True)
+        self.embedding_pipeline.close()
+        self.loader.close()
+        self.vector_stores.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.save()
+
+    def _cache_response(
+        self,
+        question: str,
+        docs_dir: DocsSelector,
+        options: Optional[SearchOptions],
+        embedding: List[float],
+        response_text: str,
+        sources: List[Dict[str, Any]]
+    ) -> Tuple[str, str]:
+        """Split a model response and remember it in the answer cache"""
+        answer, chain_of_thought = self._split_response(response_text)
+        cache_key = self._cache_key(docs_dir, options)
+        if self.answer_cache is not None and cache_key is not None:
+            self.answer_cache.put(cache_key, question, embedding, answer, chain_of_thought, sources)
+        return answer, chain_of_thought
+
+    @staticmethod
+    def _cache_key(docs_dir: DocsSelector, options: Optional[SearchOptions] = None) -> Optional[str]:
+        """Answer cache namespace, or None for federated queries and non-default search options"""
+        # Cached answers were retrieved with the default options, so they do not
+        # stand in for a search with a different k, weights or recall settings
+        if options is not None and options.model_dump(include=set(SearchOptions.model_fields), exclude_none=True):
+            return None
+        if isinstance(docs_dir, str):
+            return None if docs_dir == "*" else docs_dir
+        return docs_dir[0] if len(docs_dir) == 1 and docs_dir[0] != "*" else None
+
+    @staticmethod
+    def _source(doc: Document) -> Dict[str, Any]:
+        """Citation for a chunk, from its metadata or its page's front matter"""
+        metadata = doc.metadata
+        if "url" not in metadata and "source" in metadata:
+            # Chunks indexed before front matter was copied into metadata
+            metadata = {**read_front_matter(Path(metadata["source"])), **metadata}
+        return {
+            "docs_name": metadata.get("docs_name"),
+            "title": metadata.get("title"),
+            "url": metadata.get("url"),
+        }
+
+    def _sources(self, docs: List[Document]) -> List[Dict[str, Any]]:
+        """Distinct citations for the retrieved chunks, in rank order"""
+        sources = []
+        for doc in docs:
+            source = self._source(doc)
+            if source["url"] is not None and source not in sources:
+                sources.append(source)
+        return sources
+
+    def build_context(self, question: str, docs: List[Document]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Assemble the prompt context within the token budget, returning (context, sources)"""
+        with span("query.context"):
+            context, used, stats = self.context_builder.build(docs, url_of=lambda doc: self._source(doc)["url"])
+            prompt_tokens = count_tokens(self.prompt.format(context=context, question=question))
+        logger.info(
+            f"Prompt context: {stats['chunks']} chunks -> {stats['passages']} passages, "
+            f"{stats['context_tokens']} tokens (raw {stats['raw_tokens']}), {prompt_tokens} prompt tokens"
+        )
+        return context, self._sources(used)
+
+    @staticmethod
+    def _split_response(response_text: str) -> Tuple[str, str]:
+        """Split a model response into (answer, chain_of_thought)"""
         # If no think tags, provide a fallback
         if "<think>" not in response_text:
             chain_of_thought = "Analyzed the context and generated a response based on the provided documentation."
@@ -177,5 +1169,4 @@ class DocumentationRAG:
             # Extract response after </think>
             answer = response_text.split("</think>")[1].strip()
         
-        logger.info("Query processed successfully")
-        return answer, chain_of_thought
\ No newline at end of file
+        return answer, chain_of_thought
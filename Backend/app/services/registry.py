@@ -0,0 +1,82 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.services.indexes import index_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_store_bytes(vector_store: Any) -> int:
+    """Rough resident size of a loaded FAISS store (vectors plus chunk text)"""
+    size = index_bytes(vector_store.index)
+
+    docstore = getattr(vector_store.docstore, "_dict", None)
+    if docstore:
+        size += sum(len(doc.page_content) for doc in docstore.values())
+    return size
+
+
+class VectorStoreRegistry:
+    """Bounded, LRU-evicted registry of loaded vector stores keyed by docs_name"""
+
+    def __init__(self, max_stores: int, memory_budget_mb: int):
+        self.max_stores = max_stores
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._stores: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def get(self, docs_name: str) -> Optional[Any]:
+        """Return a loaded store and mark it as most recently used"""
+        with self._lock:
+            store = self._stores.get(docs_name)
+            if store is not None:
+                self._stores.move_to_end(docs_name)
+            return store
+
+    def put(self, docs_name: str, vector_store: Any):
+        """Register a store, evicting least recently used ones over budget"""
+        size = estimate_store_bytes(vector_store)
+        with self._lock:
+            self._stores[docs_name] = vector_store
+            self._sizes[docs_name] = size
+            self._stores.move_to_end(docs_name)
+            self._evict()
+
+    def pop(self, docs_name: str) -> Optional[Any]:
+        with self._lock:
+            self._sizes.pop(docs_name, None)
+            return self._stores.pop(docs_name, None)
+
+    def clear(self):
+        with self._lock:
+            self._stores.clear()
+            self._sizes.clear()
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._stores.keys())
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def __contains__(self, docs_name: str) -> bool:
+        with self._lock:
+            return docs_name in self._stores
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._stores)
+
+    def _evict(self):
+        # Always keep the most recently used store, even if it alone is over budget
+        while len(self._stores) > 1 and (
+            len(self._stores) > self.max_stores
+            or sum(self._sizes.values()) > self.memory_budget
+        ):
+            docs_name, _ = self._stores.popitem(last=False)
+            size = self._sizes.pop(docs_name, 0)
+            logger.info(f"Evicted vector store {docs_name} ({size / 1024 / 1024:.1f} MB) from memory")
@@ -1,102 +1,216 @@
+import hashlib
+import itertools
 import logging
 import os
-import re
+import threading
+import time
 from pathlib import Path
-from typing import List, Set
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Set
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from firecrawl import FirecrawlApp
-from langchain_community.document_loaders import FireCrawlLoader
 from pydantic import BaseModel, Field
 
 from app.core.config import settings
+from app.core.metrics import PAGES_SCRAPED, span
 from app.models.schema import DocPage
+from app.services.fetchers import FetchBackend, get_fetch_backend
+from app.services.frontier import FetchRecord, UrlFrontier
+from app.services.pagestore import format_page, open_page_store, page_filename
 
 # Get logger for the scraper module
 logger = logging.getLogger(__name__)
 
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
 class DocumentationScraper:
-    def __init__(self):
-        self.app = FirecrawlApp(
-            api_key=settings.FIRECRAWL_API_KEY
-        )
+    def __init__(self, backend: Optional[FetchBackend] = None, frontier: Optional[UrlFrontier] = None):
+        self.backend = backend or get_fetch_backend()
+        self.frontier = frontier
+        if self.frontier is None and settings.FRONTIER_ENABLED:
+            self.frontier = UrlFrontier(settings.BASE_DIR / "frontier.sqlite")
+        self._page_stores: Dict[str, Any] = {}
+        self._page_stores_lock = threading.Lock()
 
-    def get_documentation_links(self, base_url: str) -> List[str]:
+    def get_documentation_links(
+        self,
+        base_url: str,
+        docs_dir: Optional[str] = None,
+        limit: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[str]:
         """
         Get all documentation page links from a given base URL.
+
+        With docs_dir, pages already saved are revalidated during discovery
+        rather than downloaded again. Setting cancel_event stops discovery
+        early with the links found so far.
         """
         logger.info(f"Getting documentation links from {base_url}")
-        initial_crawl = self.app.crawl_url(
-            base_url,
-            params={
-                "scrapeOptions": {"formats": ["links"]},
-            },
-        )
-        all_links = []
-        for item in initial_crawl["data"]:
-            all_links.extend(item["links"])
-        filtered_links = set(
+        validators = {}
+        if self.frontier is not None and docs_dir:
+            stored = set(self.page_store(docs_dir).names())
+            validators = {
+                url: record for url, record in self.frontier.get_all(docs_dir).items()
+                if page_filename(url) in stored
+            }
+        with span("scrape.discover"):
+            all_links = self.backend.discover_links(base_url, validators, cancel_event)
+        filtered_links = list(set(
             [link.split("#")[0] for link in all_links if link.startswith(base_url)]
-        )
+        ))
+        if limit:
+            filtered_links = filtered_links[:limit]
+        self.backend.discard_prefetched(list(set(all_links) - set(filtered_links)))
         logger.info(f"Found {len(filtered_links)} unique documentation links")
-        return list(filtered_links)
+        return filtered_links
 
-    def scrape_documentation(self, base_url: str, limit: int = None) -> List[DocPage]:
-        """Scrape documentation pages from a given base URL."""
+    def iter_documentation(self, base_url: str, limit: int = None, docs_dir: Optional[str] = None) -> Iterator[DocPage]:
+        """Scrape documentation pages in batches, yielding each page as soon as its batch returns."""
         logger.info(f"Scraping doc pages from {base_url}")
 
-        filtered_links = self.get_documentation_links(base_url)
-        if limit:
-            filtered_links = filtered_links[:limit]
+        filtered_links = self.get_documentation_links(base_url, docs_dir, limit)
+        yield from self.iter_pages(filtered_links, docs_dir)
+
+    def iter_pages(self, links: List[str], docs_dir: Optional[str] = None) -> Iterator[DocPage]:
+        """Scrape the given page URLs in parallel batches, yielding pages as batches complete.
+
+        At most two batches per worker are in flight, so a slow consumer
+        throttles the crawl instead of buffering the whole site in memory.
+        When docs_dir is given, pages recorded in the URL frontier are fetched
+        conditionally and only new or changed pages are yielded.
+        """
+        batch_size = settings.SCRAPE_BATCH_SIZE
+        batches = [links[start:start + batch_size] for start in range(0, len(links), batch_size)]
+        logger.info(f"Scraping {len(links)} documentation pages in {len(batches)} batches")
+
+        known = {}
+        if self.frontier is not None and docs_dir:
+            known = self.frontier.get_many(docs_dir, links)
 
-        try:
-            logger.info(f"Scraping {len(filtered_links)} documentation pages")
-            crawl_results = self.app.batch_scrape_urls(filtered_links)
-        except Exception as e:
-            logger.error(f"Error scraping documentation pages: {str(e)}")
-            return []
-
-        doc_pages = []
-        for result in crawl_results["data"]:
-            if result.get("markdown"):
-                doc_pages.append(
-                    DocPage(
-                        title=result.get("metadata", {}).get("title", "Untitled"),
-                        content=result["markdown"],
-                        url=result.get("metadata", {}).get("url", ""),
-                    )
-                )
-            else:
-                logger.warning(
-                    f"Failed to scrape {result.get('metadata', {}).get('url', 'unknown URL')}"
-                )
-
-        logger.info(f"Successfully scraped {len(doc_pages)} pages out of {len(filtered_links)} URLs")
+        def submit(batch):
+            # A page that has gone missing locally is fetched in full, even if the site is unchanged
+            validators = {
+                url: known[url] for url in batch
+                if url in known and self.page_store(docs_dir).has(page_filename(url))
+            }
+            return executor.submit(self._fetch_with_retry, batch, validators)
+
+        scraped = 0
+        unchanged = 0
+        pending = iter(batches)
+        with ThreadPoolExecutor(
+            max_workers=settings.SCRAPE_CONCURRENCY,
+            thread_name_prefix="scrape"
+        ) as executor:
+            in_flight = set()
+            for batch in itertools.islice(pending, settings.SCRAPE_CONCURRENCY * 2):
+                in_flight.add(submit(batch))
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for page in future.result():
+                        if page.not_modified and not self.page_store(docs_dir).has(page_filename(page.url)):
+                            # Deleted while the crawl ran; the 304 has no content to save
+                            page = next(iter(self._fetch_with_retry([page.url])), None)
+                            if page is None:
+                                continue
+                        if docs_dir and self._is_unchanged(page, known.get(page.url), docs_dir):
+                            self.frontier.touch(docs_dir, page.url)
+                            unchanged += 1
+                            PAGES_SCRAPED.inc(outcome="unchanged")
+                            continue
+                        scraped += 1
+                        PAGES_SCRAPED.inc(outcome="fetched")
+                        yield page
+                        # Record the fetch only once the consumer has handled the page
+                        if self.frontier is not None and docs_dir and not page.not_modified:
+                            self.frontier.upsert(
+                                docs_dir, page.url, page.etag, page.last_modified, content_hash(page.content),
+                                page.links
+                            )
+                    next_batch = next(pending, None)
+                    if next_batch is not None:
+                        in_flight.add(submit(next_batch))
+
+        logger.info(
+            f"Successfully scraped {scraped} new or changed pages out of {len(links)} URLs "
+            f"({unchanged} unchanged)"
+        )
+
+    def _is_unchanged(self, page: DocPage, record: Optional[FetchRecord], docs_dir: str) -> bool:
+        if self.frontier is None or record is None:
+            return False
+        if page.not_modified:
+            return True
+        # Re-save pages that have gone missing even if the site is unchanged
+        if not self.page_store(docs_dir).has(page_filename(page.url)):
+            return False
+        return record.content_hash == content_hash(page.content)
+
+    def _fetch_with_retry(self, batch: List[str], validators: Optional[Dict[str, FetchRecord]] = None) -> List[DocPage]:
+        """Fetch one batch, retrying only this batch with exponential backoff"""
+        for attempt in range(settings.SCRAPE_MAX_RETRIES + 1):
+            try:
+                with span("scrape.fetch_batch"):
+                    return self.backend.fetch_batch(batch, validators)
+            except Exception as e:
+                if attempt == settings.SCRAPE_MAX_RETRIES:
+                    logger.error(f"Error scraping batch of {len(batch)} pages, giving up: {str(e)}")
+                    PAGES_SCRAPED.inc(len(batch), outcome="failed")
+                    return []
+                delay = settings.SCRAPE_RETRY_BACKOFF * (2 ** attempt)
+                logger.warning(f"Error scraping batch of {len(batch)} pages, retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+        return []
+
+    def scrape_documentation(self, base_url: str, limit: int = None, docs_dir: Optional[str] = None) -> List[DocPage]:
+        """Scrape documentation pages from a given base URL."""
+        doc_pages = list(self.iter_documentation(base_url, limit, docs_dir))
+        logger.info(f"Successfully scraped {len(doc_pages)} pages from {base_url}")
         return doc_pages
 
+    def page_store(self, docs_dir: str):
+        """The collection's page store, opened once per scraper"""
+        with self._page_stores_lock:
+            if docs_dir not in self._page_stores:
+                self._page_stores[docs_dir] = open_page_store(docs_dir, create=True)
+            return self._page_stores[docs_dir]
+
+    def save_documentation_page(self, page: DocPage, docs_dir: str) -> str:
+        """Save a single scraped page to the collection and return its filename."""
+        filename = page_filename(page.url)
+        with span("scrape.save"):
+            self.page_store(docs_dir).put(filename, format_page(page.title, page.url, page.content))
+        return filename
+
     def save_documentation_pages(self, doc_pages: List[DocPage], docs_dir: str):
-        """Save scraped documentation pages to markdown files."""
-        docs_path = settings.DOCS_DIR / docs_dir
-        docs_path.mkdir(parents=True, exist_ok=True)
-
-        for page in doc_pages:
-            # Create a safe filename based on the URL
-            url_path = page.url.split("://")[1] if "://" in page.url else page.url
-            safe_filename = re.sub(r'[<>:"/\\|?*]', '-', url_path.split('?')[0])
-            safe_filename = safe_filename.strip("/").replace("/", "-")
-            filepath = docs_path / f"{safe_filename}.md"
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write("---\n")
-                f.write(f"title: {page.title}\n")
-                f.write(f"url: {page.url}\n")
-                f.write("---\n\n")
-                f.write(page.content)
+        """Save scraped documentation pages to the collection."""
+        with span("scrape.save"):
+            self.page_store(docs_dir).put_many(
+                (page_filename(page.url), format_page(page.title, page.url, page.content)) for page in doc_pages
+            )
 
         logger.info(f"Saved {len(doc_pages)} pages to {docs_dir}")
 
-    def pull_docs(self, base_url: str, docs_dir: str, n_pages: int = None):
-        """Pull documentation from a URL and save it to the specified directory."""
-        doc_pages = self.scrape_documentation(base_url, n_pages)
-        self.save_documentation_pages(doc_pages, docs_dir)
-        return len(doc_pages) 
\ No newline at end of file
+    def close(self):
+        self.backend.close()
+        if self.frontier is not None:
+            self.frontier.close()
+        with self._page_stores_lock:
+            for pages in self._page_stores.values():
+                pages.close()
+            self._page_stores.clear()
+
+    def pull_docs(self, base_url: str, docs_dir: str, n_pages: int = None) -> List[str]:
+        """Pull documentation from a URL and save new or changed pages to the specified directory.
+
+        Returns the filenames that were written.
+        """
+        filenames = []
+        for page in self.iter_documentation(base_url, n_pages, docs_dir):
+            filenames.append(self.save_documentation_page(page, docs_dir))
+        logger.info(f"Saved {len(filenames)} pages to {docs_dir}")
+        return filenames
+
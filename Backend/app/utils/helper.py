@@ -1,8 +1,16 @@
 import glob
+import json
+import threading
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 from app.core.config import settings
+from app.services.pagestore import open_page_store
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no cross-process locking on Windows
+    fcntl = None
 
 def get_existing_docs() -> List[str]:
     """Get all documentation directories with -docs suffix"""
@@ -11,9 +19,12 @@ def get_existing_docs() -> List[str]:
     return docs_dirs
 
 def get_doc_page_count(docs_dir: str) -> int:
-    """Get number of markdown files in a documentation directory"""
-    dir_path = settings.DOCS_DIR / docs_dir
-    return len(list(dir_path.glob("*.md")))
+    """Get number of pages in a documentation directory"""
+    pages = open_page_store(docs_dir)
+    try:
+        return pages.count()
+    finally:
+        pages.close()
 
 def sanitize_filename(filename: str) -> str:
     """Create a safe filename from potentially unsafe input"""
@@ -22,4 +33,133 @@ def sanitize_filename(filename: str) -> str:
     sanitized = ''.join(c for c in filename if c in valid_chars)
     # Replace spaces with underscores
     sanitized = sanitized.replace(' ', '_')
-    return sanitized
\ No newline at end of file
+    return sanitized
+
+def read_front_matter(path: Path) -> Dict[str, str]:
+    """Read the key: value front matter block the scraper writes at the top of each page"""
+    meta = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.readline().strip() != "---":
+                return meta
+            for line in f:
+                if line.strip() == "---":
+                    break
+                key, sep, value = line.partition(":")
+                if sep:
+                    meta[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return meta
+
+class ProcessLock:
+    """Lock held across threads and, through flock on a lock file, across worker processes.
+
+    Re-entrant within a thread, so helpers can take it while their caller holds it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1 and fcntl is not None:
+            try:
+                self._file = open(self.path, "a")
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._depth -= 1
+                self._lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+        return False
+
+def format_sse(event: str, data) -> str:
+    """Format a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ThinkTagSplitter:
+    """Incrementally split streamed model output into thought and answer text.
+    
+    Reasoning models wrap their chain of thought in <think>...</think> before
+    the answer. Tags can be split across stream chunks, so any trailing text
+    that could be the start of a tag is held back until the next chunk.
+    """
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._state = "pending"
+        self._answer_started = False
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """Consume a chunk and return (event, text) pairs ready to emit"""
+        self._buffer += text
+        events = []
+        while True:
+            if self._state == "pending":
+                stripped = self._buffer.lstrip()
+                if stripped.startswith(self.OPEN_TAG):
+                    self._buffer = stripped[len(self.OPEN_TAG):]
+                    self._state = "thought"
+                    continue
+                if self.OPEN_TAG.startswith(stripped):
+                    # Could still turn into an opening tag
+                    return events
+                self._state = "answer"
+                continue
+
+            if self._state == "thought":
+                end = self._buffer.find(self.CLOSE_TAG)
+                if end >= 0:
+                    if end:
+                        events.append(("thought", self._buffer[:end]))
+                    self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                    self._state = "answer"
+                    continue
+                held = self._partial_tag_length(self.CLOSE_TAG)
+                ready = self._buffer[:len(self._buffer) - held]
+                if ready:
+                    events.append(("thought", ready))
+                self._buffer = self._buffer[len(ready):]
+                return events
+
+            # Answer: everything is emitted as-is, minus leading whitespace
+            if not self._answer_started:
+                self._buffer = self._buffer.lstrip()
+                self._answer_started = bool(self._buffer)
+            if self._buffer:
+                events.append(("answer", self._buffer))
+            self._buffer = ""
+            return events
+
+    def flush(self) -> List[Tuple[str, str]]:
+        """Emit whatever is still buffered once the stream has ended"""
+        if not self._buffer:
+            return []
+        event = "thought" if self._state == "thought" else "answer"
+        text, self._buffer = self._buffer, ""
+        return [(event, text)]
+
+    def _partial_tag_length(self, tag: str) -> int:
+        for length in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+            if self._buffer.endswith(tag[:length]):
+                return length
+        return 0
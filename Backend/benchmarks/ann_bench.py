@@ -0,0 +1,112 @@
+"""
+Offline recall-vs-latency benchmark for the ANN index types.
+
+Builds each configured index over synthetic clustered vectors and compares it
+with the exact flat index across nprobe/efSearch sweeps, e.g.
+
+    python -m benchmarks.ann_bench --vectors 200000 --dim 768 --output ann.json
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from app.models.schema import IndexConfig
+from app.services.indexes import build_index, index_bytes, search_params
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs, a rough stand-in for topic-clustered documentation chunks"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def time_search(index, queries: np.ndarray, k: int, params=None):
+    """Search one query at a time, as the API does, and return (ids, p50 ms, p95 ms)"""
+    latencies = []
+    ids = []
+    for query in queries:
+        start = time.perf_counter()
+        if params is None:
+            _, row = index.search(query.reshape(1, -1), k)
+        else:
+            _, row = index.search(query.reshape(1, -1), k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(row[0])
+    return np.array(ids), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def run(args) -> list:
+    vectors = synthetic_vectors(args.vectors, args.dim, args.clusters)
+    queries = synthetic_vectors(args.queries, args.dim, args.clusters, seed=1)
+    faiss.omp_set_num_threads(args.threads)
+
+    baseline = build_index(IndexConfig(index_type="flat"), vectors)
+    truth, p50, p95 = time_search(baseline, queries, args.k)
+    results = [{
+        "index_type": "flat", "param": None, "recall": 1.0,
+        "p50_ms": round(p50, 3), "p95_ms": round(p95, 3),
+        "build_seconds": 0.0, "memory_mb": round(index_bytes(baseline) / 1024 / 1024, 1),
+    }]
+    print(f"{'flat':<9} {'':>12}  recall@{args.k}=1.000  p50={p50:.3f}ms  p95={p95:.3f}ms")
+
+    for index_type in args.index_types:
+        config = IndexConfig(
+            index_type=index_type, train_threshold=0, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m
+        )
+        start = time.perf_counter()
+        index = build_index(config, vectors)
+        build_seconds = time.perf_counter() - start
+
+        sweep = args.ef_search if index_type == "hnsw" else args.nprobe
+        for value in sweep:
+            if index_type == "hnsw":
+                params = search_params(index, ef_search=value)
+            else:
+                params = search_params(index, nprobe=value)
+            found, p50, p95 = time_search(index, queries, args.k, params)
+            recall = recall_at_k(found, truth)
+            name = "ef_search" if index_type == "hnsw" else "nprobe"
+            results.append({
+                "index_type": index_type, "param": {name: value}, "recall": round(recall, 4),
+                "p50_ms": round(p50, 3), "p95_ms": round(p95, 3),
+                "build_seconds": round(build_seconds, 2),
+                "memory_mb": round(index_bytes(index) / 1024 / 1024, 1),
+            })
+            print(
+                f"{index_type:<9} {name + '=' + str(value):>12}  recall@{args.k}={recall:.3f}  "
+                f"p50={p50:.3f}ms  p95={p95:.3f}ms"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ANN index recall and latency against flat search")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--index-types", nargs="+", default=["hnsw", "ivf_flat", "ivf_pq"])
+    parser.add_argument("--nlist", type=int, default=0, help="0 picks 4*sqrt(vectors)")
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
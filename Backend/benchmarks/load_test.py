@@ -0,0 +1,113 @@
+"""
+Concurrent load test for the /api/query endpoint.
+
+Fires a fixed number of queries at increasing client concurrency and reports
+queries/sec and latency percentiles for each level, e.g.
+
+    python -m benchmarks.load_test --docs-name fastapi-docs --concurrency 1 4 16
+
+Requests cycle through the questions in --questions-file (one per line), or a
+built-in list. Repeated questions are answered from the answer cache, so run
+the server with ANSWER_CACHE_ENABLED=false to measure the embedding, search and
+LLM path rather than the cache.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "How do I get started?",
+    "How do I install it?",
+    "How is configuration loaded?",
+    "How do I define a route?",
+    "How are requests validated?",
+    "How do I handle errors?",
+    "How does authentication work?",
+    "How do I connect to a database?",
+    "How do I write tests?",
+    "How do I deploy to production?",
+    "How do I enable logging?",
+    "How are background tasks run?",
+    "How do I serve static files?",
+    "How do I add middleware?",
+    "How do websockets work?",
+    "How do I upload files?",
+]
+
+
+async def run_level(
+    client: httpx.AsyncClient, url: str, payloads: List[dict], concurrency: int, n_requests: int
+) -> dict:
+    """Send n_requests queries using `concurrency` parallel clients, cycling through payloads"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(n_requests))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payloads[i % len(payloads)])
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "qps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+    }
+
+
+async def main(args):
+    url = f"{args.base_url.rstrip('/')}/api/query"
+    if args.questions_file:
+        with open(args.questions_file, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = DEFAULT_QUESTIONS
+    payloads = [{"question": question, "docs_name": args.docs_name} for question in questions]
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        results = []
+        for concurrency in args.concurrency:
+            result = await run_level(client, url, payloads, concurrency, args.requests)
+            print(
+                f"concurrency={result['concurrency']:>3}  qps={result['qps']:.2f}  "
+                f"p50={result['p50_ms'] or 0:.0f}ms  p95={result['p95_ms'] or 0:.0f}ms  "
+                f"errors={result['errors']}"
+            )
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the /api/query endpoint")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--docs-name", required=True)
+    parser.add_argument("--questions-file", help="Questions to send, one per line (default: a built-in list)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Optional path for JSON results")
+    asyncio.run(main(parser.parse_args()))
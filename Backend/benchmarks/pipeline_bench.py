@@ -0,0 +1,259 @@
+"""
+Offline benchmark of the ingestion and query hot paths.
+
+Generates a synthetic markdown corpus in the scraper's on-disk format, indexes
+it with a deterministic hashing embedding model and answers questions through
+the FastAPI app with a stub LLM, so no network or model download is needed.
+Ingestion is broken down by the process.* stage spans (load, split, embed,
+index, save); retrieval and end-to-end /api/query report latency percentiles,
+e.g.
+
+    python -m benchmarks.pipeline_bench --chunks 1000 10000 100000 --output pipeline.json
+"""
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.core.config import settings
+from app.core.metrics import collect_timings
+from app.models.schema import DocPage
+from app.services import rag as rag_module
+from app.services.fetchers import get_fetch_backend
+from app.services.scrapper import DocumentationScraper
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+TOPICS = [
+    "routing", "authentication", "database", "caching", "testing", "deployment", "logging", "middleware",
+    "templates", "websockets", "migrations", "configuration", "security", "performance", "streaming", "plugins",
+]
+FILLER = (
+    "the request handler returns a response object when the client sends data to the server and the "
+    "framework validates every field before calling your function with typed parameters"
+).split()
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words feature hashing, a stand-in for a sentence embedding model"""
+
+    def __init__(self, model_name: str = "hashing", dim: int = 384, **kwargs):
+        self.model_name = model_name
+        self.dim = dim
+        self._buckets: Dict[str, int] = {}
+
+    def _bucket(self, word: str) -> int:
+        bucket = self._buckets.get(word)
+        if bucket is None:
+            bucket = self._buckets[word] = zlib.crc32(word.encode("utf-8")) % self.dim
+        return bucket
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        buckets = [self._bucket(word) for word in _WORD_PATTERN.findall(text.lower())]
+        if buckets:
+            np.add.at(vector, buckets, 1.0)
+            vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def synthetic_page(rng: random.Random, page: int, n_chars: int) -> DocPage:
+    """A documentation page of roughly n_chars characters with headings, prose and code"""
+    topic = TOPICS[page % len(TOPICS)]
+    parts = [f"# {topic.title()} guide {page}\n"]
+    size = 0
+    section = 0
+    while size < n_chars:
+        identifier = f"{topic}_{page}.handler_{section}"
+        words = [rng.choice(FILLER) for _ in range(rng.randint(40, 90))]
+        words[rng.randrange(len(words))] = topic
+        paragraph = (
+            f"## Section {section}: {topic} step {section}\n\n"
+            f"{' '.join(words)}. Call `{identifier}()` to configure {topic} for page {page}.\n\n"
+            f"```python\nfrom {topic}_{page} import handler_{section}\nhandler_{section}(enabled=True)\n```\n"
+        )
+        parts.append(paragraph)
+        size += len(paragraph)
+        section += 1
+    return DocPage(
+        url=f"https://docs.example.com/{topic}/page-{page}",
+        title=f"{topic.title()} guide {page}",
+        content="\n".join(parts)
+    )
+
+
+def write_corpus(docs_name: str, n_chunks: int, chunks_per_page: int, seed: int) -> int:
+    """Write enough pages for about n_chunks chunks and return the page count"""
+    rng = random.Random(seed)
+    n_pages = max(1, n_chunks // chunks_per_page)
+    # The splitter breaks at paragraph boundaries, so chunks end up about three quarters full
+    page_chars = chunks_per_page * (settings.CHUNK_SIZE - settings.CHUNK_OVERLAP) * 3 // 4
+    # Pages are written through the scraper so the files match what it saves; nothing is fetched
+    scraper = DocumentationScraper(get_fetch_backend("http"))
+    try:
+        batch = []
+        for page in range(n_pages):
+            batch.append(synthetic_page(rng, page, page_chars))
+            if len(batch) == 1000:
+                scraper.save_documentation_pages(batch, docs_name)
+                batch = []
+        if batch:
+            scraper.save_documentation_pages(batch, docs_name)
+    finally:
+        scraper.close()
+    return n_pages
+
+
+def questions(n: int, n_pages: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    asked = []
+    for _ in range(n):
+        page = rng.randrange(n_pages)
+        topic = TOPICS[page % len(TOPICS)]
+        asked.append(f"How do I use {topic}_{page}.handler_{rng.randint(0, 3)} for {topic}?")
+    return asked
+
+
+def percentiles(latencies: List[float]) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+    }
+
+
+def bench_size(client: TestClient, rag, n_chunks: int, args) -> dict:
+    docs_name = f"bench-{n_chunks}"
+    start = time.perf_counter()
+    n_pages = write_corpus(docs_name, n_chunks, args.chunks_per_page, args.seed)
+    generate_seconds = time.perf_counter() - start
+    corpus_bytes = sum(path.stat().st_size for path in (settings.DOCS_DIR / docs_name).iterdir())
+
+    start = time.perf_counter()
+    with collect_timings() as timings:
+        rag.process_documents(docs_name)
+    process_seconds = time.perf_counter() - start
+    store = rag.get_vector_store(docs_name)
+    chunks = store.index.ntotal
+    print(
+        f"{chunks:>9} chunks  process={process_seconds:.2f}s ({chunks / process_seconds:.0f} chunks/sec)  "
+        + "  ".join(f"{stage}={ms / 1000:.2f}s" for stage, ms in timings.items() if stage != "process.total")
+    )
+
+    asked = questions(args.queries, n_pages, args.seed)
+    for question in asked[:args.warmup]:
+        rag.retrieve(question, docs_name)
+    retrieve_latencies = []
+    for question in asked:
+        start = time.perf_counter()
+        rag.retrieve(question, docs_name)
+        retrieve_latencies.append((time.perf_counter() - start) * 1000)
+    retrieve = percentiles(retrieve_latencies)
+
+    query_latencies = []
+    stage_totals: Dict[str, float] = {}
+    for i, question in enumerate(asked):
+        start = time.perf_counter()
+        response = client.post(
+            "/api/query", json={"question": question, "docs_name": docs_name, "include_timings": True}
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        response.raise_for_status()
+        if i < args.warmup:
+            continue
+        query_latencies.append(elapsed)
+        for stage, ms in (response.json()["timings"] or {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    query = percentiles(query_latencies)
+    query["stages_mean_ms"] = {stage: round(ms / len(query_latencies), 3) for stage, ms in stage_totals.items()}
+    print(
+        f"{'':>9}         retrieve p50={retrieve['p50_ms']:.2f}ms p95={retrieve['p95_ms']:.2f}ms  "
+        f"/api/query p50={query['p50_ms']:.2f}ms p95={query['p95_ms']:.2f}ms"
+    )
+
+    return {
+        "target_chunks": n_chunks,
+        "chunks": chunks,
+        "pages": n_pages,
+        "corpus_mb": round(corpus_bytes / 1024 / 1024, 1),
+        "generate_seconds": round(generate_seconds, 2),
+        "index_type": type(store.index).__name__,
+        "process_seconds": round(process_seconds, 3),
+        "process_chunks_per_sec": round(chunks / process_seconds, 1),
+        "process_stages_ms": {stage: round(ms, 1) for stage, ms in timings.items()},
+        "retrieve": retrieve,
+        "query": query,
+    }
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pipeline-bench-") as workdir:
+        base_dir = Path(args.workdir or workdir)
+        settings.BASE_DIR = base_dir
+        settings.DOCS_DIR = base_dir / "docs"
+        settings.DOCS_DIR.mkdir(parents=True, exist_ok=True)
+        # Measure every stage on each run: no caches, no frontier, in-process embedding
+        settings.EMBEDDING_CACHE_ENABLED = False
+        settings.ANSWER_CACHE_ENABLED = False
+        settings.FRONTIER_ENABLED = False
+        settings.EMBEDDING_WORKERS = 0
+        settings.GROQ_API_KEY = settings.GROQ_API_KEY or "offline-benchmark"
+        rag_module.HuggingFaceEmbeddings = lambda model_name, **kwargs: HashingEmbeddings(model_name, dim=args.dim)
+
+        from app.main import app
+
+        results = []
+        with TestClient(app) as client:
+            rag = app.state.rag
+            rag.llm = FakeListChatModel(responses=["<think>Stub reasoning.</think>Stub answer."])
+            for n_chunks in args.chunks:
+                results.append(bench_size(client, rag, n_chunks, args))
+
+    return {
+        "config": {
+            **vars(args),
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+            "index_type": settings.INDEX_TYPE,
+            "hybrid_search": settings.HYBRID_SEARCH_ENABLED,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and query hot paths on a synthetic corpus")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Corpus sizes in chunks, e.g. 1000 10000 100000 1000000")
+    parser.add_argument("--chunks-per-page", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384, help="Fake embedding dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep the corpus and stores here instead of a temporary directory")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,147 @@
+"""
+Offline scraping throughput benchmark.
+
+Serves a synthetic documentation site from a local HTTP server and scrapes
+it with the plain-HTTP fetch backend at several concurrency levels. Each level
+is followed by a conditional refresh pass, where the fixture answers 304 for
+unchanged pages. Both passes are timed from link discovery to the last saved
+page, and report how many full (200) and conditional (304) responses the
+fixture served, e.g.
+
+    python -m benchmarks.scrape_bench --pages 500 --concurrency 1 4 8
+"""
+import argparse
+import collections
+import json
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.fetchers import get_fetch_backend
+from app.services.frontier import UrlFrontier
+from app.services.scrapper import DocumentationScraper
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /docs/ as an index linking to /docs/page-N pages"""
+
+    # Responses served, by status code
+    served = collections.Counter()
+    served_lock = threading.Lock()
+
+    def __init__(self, n_pages: int, latency: float, *args, **kwargs):
+        self.n_pages = n_pages
+        self.latency = latency
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.rstrip("/") == "/docs":
+            links = "".join(f'<li><a href="/docs/page-{i}">Page {i}</a></li>' for i in range(self.n_pages))
+            body = f"<html><head><title>Docs</title></head><body><ul>{links}</ul></body></html>"
+        elif self.path.startswith("/docs/page-"):
+            page = self.path.rsplit("-", 1)[1]
+            etag = f'"page-{page}"'
+            if self.headers.get("If-None-Match") == etag:
+                with self.served_lock:
+                    self.served[304] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            paragraphs = "".join(
+                f"<p>Paragraph {j} of page {page} describing <code>api_call_{j}()</code>.</p>"
+                for j in range(20)
+            )
+            body = (
+                f"<html><head><title>Page {page}</title></head><body>"
+                f"<h1>Page {page}</h1>{paragraphs}<pre>pip install example</pre></body></html>"
+            )
+        else:
+            self.send_error(404)
+            return
+
+        payload = body.encode("utf-8")
+        with self.served_lock:
+            self.served[200] += 1
+        self.send_response(200)
+        if self.path.startswith("/docs/page-"):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(args) -> list:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, args.pages, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/docs/"
+
+    settings.SCRAPE_RATE_LIMIT = args.rate_limit
+    settings.SCRAPE_MAX_DISCOVERY = args.pages + 1
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            settings.SCRAPE_CONCURRENCY = concurrency
+            with tempfile.TemporaryDirectory() as tmp:
+                settings.DOCS_DIR = Path(tmp) / "docs"
+                frontier = UrlFrontier(Path(tmp) / "frontier.sqlite")
+                scraper = DocumentationScraper(get_fetch_backend("http"), frontier)
+                try:
+                    result = {"concurrency": concurrency}
+                    for phase in ("full", "refresh"):
+                        FixtureHandler.served.clear()
+                        start = time.perf_counter()
+                        links = scraper.get_documentation_links(base_url, "bench-docs")
+                        discover_seconds = time.perf_counter() - start
+                        pages = 0
+                        for page in scraper.iter_pages(links, "bench-docs"):
+                            scraper.save_documentation_page(page, "bench-docs")
+                            pages += 1
+                        elapsed = time.perf_counter() - start
+                        result[phase] = {
+                            "pages": pages,
+                            "seconds": round(elapsed, 3),
+                            "discover_seconds": round(discover_seconds, 3),
+                            "urls_per_sec": round(len(links) / elapsed, 1) if elapsed else None,
+                            "full_responses": FixtureHandler.served[200],
+                            "not_modified_responses": FixtureHandler.served[304],
+                        }
+                finally:
+                    scraper.close()
+
+            full, refresh = result["full"], result["refresh"]
+            print(
+                f"concurrency={concurrency:>3}  "
+                f"full: {full['pages']} pages at {full['urls_per_sec']} urls/sec "
+                f"({full['full_responses']} GETs, {full['not_modified_responses']} 304s)  "
+                f"refresh: {refresh['pages']} changed at {refresh['urls_per_sec']} urls/sec "
+                f"({refresh['full_responses']} GETs, {refresh['not_modified_responses']} 304s)"
+            )
+            results.append(result)
+    finally:
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scraping against a local fixture site")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated server latency per request (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/sec per host, 0 disables")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
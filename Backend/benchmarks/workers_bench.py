@@ -0,0 +1,235 @@
+"""
+Memory and throughput of multi-worker serving by worker count.
+
+Builds a synthetic collection (see pipeline_bench), then for each worker count
+and preload mode starts gunicorn with gunicorn.conf.py, drives /api/query with
+the load test client and reports queries/sec next to the memory of the master
+and its workers. RSS counts shared pages once per process; PSS splits them
+between the processes sharing them, so its total is the real footprint. The
+LLM is a stub; the embedding model is the configured one unless
+--fake-embeddings is given. Linux only (reads /proc), e.g.
+
+    python -m benchmarks.workers_bench --workers 1 2 4 8 --output workers.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import run_level
+from benchmarks.pipeline_bench import HashingEmbeddings, questions, write_corpus
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DOCS_NAME = "bench-workers"
+
+
+def serving_app():
+    """App factory for the gunicorn workers, with the LLM (and optionally embeddings) stubbed"""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    from app.services import rag as rag_module
+
+    rag_module.ChatGroq = lambda **kwargs: FakeListChatModel(
+        responses=["<think>Stub reasoning.</think>Stub answer."]
+    )
+    if os.environ.get("BENCH_FAKE_EMBEDDINGS") == "1":
+        rag_module.HuggingFaceEmbeddings = lambda model_name, **kwargs: HashingEmbeddings(model_name)
+
+    from app.main import app
+    return app
+
+
+def build_collection(base_dir: Path, args) -> int:
+    """Write and index the benchmark corpus, returning its chunk count"""
+    from app.core.config import settings
+    from app.services import rag as rag_module
+
+    settings.BASE_DIR = base_dir
+    settings.DOCS_DIR = base_dir / "docs"
+    settings.DOCS_DIR.mkdir(parents=True, exist_ok=True)
+    settings.GROQ_API_KEY = settings.GROQ_API_KEY or "offline-benchmark"
+    settings.FRONTIER_ENABLED = False
+    if args.fake_embeddings:
+        rag_module.HuggingFaceEmbeddings = lambda model_name, **kwargs: HashingEmbeddings(model_name)
+
+    write_corpus(DOCS_NAME, args.chunks, args.chunks_per_page, args.seed)
+    rag = rag_module.DocumentationRAG()
+    try:
+        rag.process_documents(DOCS_NAME)
+        return rag.get_vector_store(DOCS_NAME).index.ntotal
+    finally:
+        rag.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        children = (task / "children").read_text().split()
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """Summed RSS and PSS of a process and all its descendants"""
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for member in process_tree(pid):
+        try:
+            lines = Path(f"/proc/{member}/smaps_rollup").read_text().splitlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                totals[f"{key.lower()}_mb"] += int(value.split()[0]) / 1024
+    return {key: round(value, 1) for key, value in totals.items()}
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} did not become ready in {timeout:.0f}s")
+
+
+async def drive(base_url: str, concurrency: int, n_requests: int, warmup: int, n_pages: int, seed: int) -> dict:
+    url = f"{base_url}/api/query"
+    # A different question per request, so each one is embedded and searched
+    payloads = [
+        {"question": question, "docs_name": DOCS_NAME}
+        for question in questions(warmup + n_requests, n_pages, seed)
+    ]
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        # Spread warmup over the workers so each has loaded its model and store
+        await run_level(client, url, payloads[:warmup], concurrency, warmup)
+        return await run_level(client, url, payloads[warmup:], concurrency, n_requests)
+
+
+def bench_workers(base_dir: Path, n_workers: int, preload: bool, args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(BACKEND_DIR), os.environ.get("PYTHONPATH")])),
+        "BIND": f"127.0.0.1:{port}",
+        "WEB_WORKERS": str(n_workers),
+        "PRELOAD_APP": "1" if preload else "0",
+        "BASE_DIR": str(base_dir),
+        "DOCS_DIR": str(base_dir / "docs"),
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "offline-benchmark"),
+        "PRELOAD_COLLECTIONS": json.dumps([DOCS_NAME]),
+        "ANSWER_CACHE_ENABLED": "false",
+        "FRONTIER_ENABLED": "false",
+        "BENCH_FAKE_EMBEDDINGS": "1" if args.fake_embeddings else "0",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "benchmarks.workers_bench:serving_app()"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    try:
+        start = time.perf_counter()
+        wait_until_ready(base_url, server, args.startup_timeout)
+        startup_seconds = time.perf_counter() - start
+        idle = memory_mb(server.pid)
+        concurrency = args.concurrency or 2 * n_workers
+        n_pages = max(1, args.chunks // args.chunks_per_page)
+        load = asyncio.run(drive(base_url, concurrency, args.requests, args.warmup, n_pages, args.seed))
+        loaded = memory_mb(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    result = {
+        "workers": n_workers,
+        "preload": preload,
+        "startup_seconds": round(startup_seconds, 2),
+        "idle": idle,
+        "after_load": loaded,
+        "pss_mb_per_worker": round(loaded["pss_mb"] / n_workers, 1),
+        "concurrency": concurrency,
+        "qps": round(load["qps"], 2),
+        "p50_ms": round(load["p50_ms"] or 0, 1),
+        "p95_ms": round(load["p95_ms"] or 0, 1),
+        "errors": load["errors"],
+    }
+    print(
+        f"workers={n_workers:<3} preload={'yes' if preload else 'no ':<3}  qps={result['qps']:.1f}  "
+        f"p95={result['p95_ms']:.0f}ms  rss={loaded['rss_mb']:.0f}MB  pss={loaded['pss_mb']:.0f}MB  "
+        f"({result['pss_mb_per_worker']:.0f}MB/worker)"
+    )
+    return result
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="workers-bench-") as workdir:
+        base_dir = Path(args.workdir or workdir)
+        chunks = build_collection(base_dir, args)
+        print(f"Indexed {chunks} chunks")
+        results = [
+            bench_workers(base_dir, n_workers, preload, args)
+            for preload in args.preload
+            for n_workers in args.workers
+        ]
+
+    return {
+        "config": {
+            **vars(args),
+            "chunks_indexed": chunks,
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory and throughput against gunicorn worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--preload", type=lambda value: value.lower() in ("1", "yes", "true"), nargs="+",
+                        default=[True, False], help="Preload modes to compare, e.g. --preload yes no")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--chunks-per-page", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per configuration")
+    parser.add_argument("--warmup", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, help="Client concurrency (default: twice the worker count)")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use hashing embeddings instead of downloading the embedding model")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep the corpus and stores here instead of a temporary directory")
+    parser.add_argument("--verbose", action="store_true", help="Show the server logs")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for serving the API with several worker processes, e.g.
+
+    gunicorn app.main:app
+
+from the Backend directory (this file is picked up automatically).
+
+With preload_app the application and the embedding model are loaded once in
+the master before it forks, so workers share the model weights copy-on-write
+instead of each holding a copy. Vector stores are opened per worker; they are
+memory-mapped (VECTOR_STORE_MMAP), so index pages are shared through the page
+cache, and SQLite connections are never carried across the fork.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_APP", "1") != "0"
+timeout = 120
+graceful_timeout = 30
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from app.core.config import settings
+    from app.services.rag import load_embeddings
+
+    load_embeddings(settings.EMBEDDING_MODEL)
+    # Move everything loaded so far out of the collector's reach, so collections
+    # in the workers do not write to (and un-share) the preloaded objects
+    gc.freeze()
+    server.log.info(f"Preloaded {settings.EMBEDDING_MODEL} for {server.cfg.workers} workers")
+
+
+def post_fork(server, worker):
+    # Split the cores between workers instead of each using all of them
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, multiprocessing.cpu_count() // server.cfg.workers))